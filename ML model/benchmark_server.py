@@ -0,0 +1,196 @@
+# Load test for the TDO server: drives /getRoute (and optionally /getTDO) at a fixed concurrency
+# against the local routing stand-in and reports RPS and p50/p95/p99 per stage.
+#
+#   python benchmark_server.py                          # in-process app, local backend
+#   python benchmark_server.py --url http://host:8000   # already running server
+#   python benchmark_server.py --compare benchmarks/<previous>.json
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks")
+
+# Depots/hubs the requests are drawn from, trips = every ordered pair
+PLACES = [
+    "Connaught Place, Delhi", "Cyber Hub, Gurugram", "Noida Sector 18", "IGI Airport Terminal 3",
+    "Okhla Industrial Area", "Dwarka Sector 21", "Faridabad Sector 12", "Ghaziabad Kaushambi",
+    "Manesar IMT", "Sonipat Kundli",
+]
+PERCENTILES = (50, 95, 99)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def summarize(samples):
+    values = np.asarray(samples, dtype=float) * 1000.0  # ms
+    if len(values) == 0:
+        return {"count": 0}
+    summary = {"count": int(len(values)), "mean_ms": float(values.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{p}_ms"] = float(value)
+    return summary
+
+
+def make_requests(args, rng):
+    trips = [(a, b) for a in PLACES[:args.trips] for b in PLACES[:args.trips] if a != b]
+    requests = []
+    for i in range(args.requests):
+        if args.tdo_batch and i % args.tdo_every == 0:
+            samples = np.column_stack((
+                rng.integers(20, 65, args.tdo_batch), rng.uniform(50, 99, args.tdo_batch),
+                rng.uniform(0.1, 0.7, args.tdo_batch), rng.uniform(0.1, 0.3, args.tdo_batch),
+                rng.uniform(0.1, 0.6, args.tdo_batch), rng.integers(0, 5, args.tdo_batch),
+                rng.uniform(3, 10, args.tdo_batch),
+            ))
+            requests.append(("/getTDO", {"samples": samples.tolist()}))
+        else:
+            start, end = trips[rng.integers(len(trips))]
+            requests.append(("/getRoute", {"start_place": start, "end_place": end, "format": args.format}))
+    return requests
+
+
+async def run(args):
+    import httpx
+    from stages import parse_server_timing
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60.0)
+        app_module = None
+    else:
+        import server as app_module
+        await app_module.startup()  # ASGITransport doesn't send lifespan events
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://bench", timeout=60.0)
+
+    rng = np.random.default_rng(args.seed)
+    requests = make_requests(args, rng)
+    totals = {}
+    stages = {}
+    errors = 0
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                errors += 1
+                if errors <= 5:
+                    print(f"[WARN] {path} failed: {e}")
+                continue
+            totals.setdefault(path, []).append(time.perf_counter() - start)
+            for name, seconds in parse_server_timing(response.headers.get("server-timing", "")).items():
+                stages.setdefault(f"{path} {name}", []).append(seconds)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    cache_stats = None
+    try:
+        cache_stats = (await client.get("/cacheStats")).json()
+    except httpx.HTTPError:
+        pass
+    await client.aclose()
+    if app_module is not None:
+        await app_module.shutdown()
+
+    done = sum(len(v) for v in totals.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "backend_latency_ms": os.environ.get("LOCAL_BACKEND_LATENCY_MS"),
+        "wall_seconds": wall,
+        "requests": done,
+        "errors": errors,
+        "rps": done / wall if wall > 0 else 0.0,
+        "latency": {path: summarize(values) for path, values in sorted(totals.items())},
+        "stages": {name: summarize(values) for name, values in sorted(stages.items())},
+        "caches": cache_stats,
+    }
+
+
+def print_report(report, previous=None):
+    print(f"\ncommit {report['commit']}  requests {report['requests']}  errors {report['errors']}  "
+          f"concurrency {report['config']['concurrency']}  RPS {report['rps']:.1f}")
+    if previous:
+        print(f"previous {previous['commit']}  RPS {previous['rps']:.1f}  ({(report['rps'] / previous['rps'] - 1) * 100:+.1f}%)")
+    header = f"{'':34}" + "".join(f"{f'p{p} ms':>12}" for p in PERCENTILES)
+    for section in ("latency", "stages"):
+        print(f"\n{section}\n{header}")
+        for name, summary in report[section].items():
+            if not summary.get("count"):
+                continue
+            row = f"{name:34}" + "".join(f"{summary[f'p{p}_ms']:12.2f}" for p in PERCENTILES)
+            old = previous.get(section, {}).get(name) if previous else None
+            if old and old.get("count"):
+                row += f"   p99 {(summary['p99_ms'] / old['p99_ms'] - 1) * 100:+.1f}%" if old["p99_ms"] else ""
+            print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test and latency benchmark for server.py")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--trips", type=int, default=6, help="distinct places used, trips = n*(n-1)")
+    parser.add_argument("--format", default="points", choices=["points", "polyline", "float32"])
+    parser.add_argument("--tdo-batch", type=int, default=0, help="also send /getTDO batches of this size")
+    parser.add_argument("--tdo-every", type=int, default=10, help="every Nth request is a /getTDO batch")
+    parser.add_argument("--latency", default="geocode=40,reverse=40,directions=150",
+                        help="injected local backend latency (see routing_backend.py)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="result file (default benchmarks/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="previous result file to diff against")
+    args = parser.parse_args()
+
+    if not args.url:
+        # Offline: local stand-in, fresh cache dir so every run starts cold
+        os.environ.setdefault("ROUTING_BACKEND", "local")
+        os.environ["LOCAL_BACKEND_LATENCY_MS"] = args.latency
+        os.environ.setdefault("TDO_CACHE_DIR", tempfile.mkdtemp(prefix="tdo-bench-"))
+        os.environ.setdefault("TDO_MODEL_POLL_SECONDS", "0")
+        sys.path.insert(0, BASE_DIR)
+
+    report = asyncio.run(run(args))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_report(report, previous)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json")
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\n[INFO] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Cache Configuration (override with env vars when deploying) ---
+CACHE_DIR = os.environ.get("TDO_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+GEOCODE_DB_PATH = os.environ.get("GEOCODE_CACHE_DB", os.path.join(CACHE_DIR, "geocode.sqlite3"))
+GEOCODE_MEMORY_SIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", 4096))
+GEOCODE_TTL = float(os.environ.get("GEOCODE_CACHE_TTL", 7 * 24 * 3600))  # places don't move, a week is fine
+REVERSE_PRECISION = int(os.environ.get("GEOCODE_REVERSE_PRECISION", 4))  # 4 decimals ~ 11 m
+ROUTE_MEMORY_SIZE = int(os.environ.get("ROUTE_CACHE_SIZE", 512))  # full geojson routes, keep this modest
+ROUTE_TTL = float(os.environ.get("ROUTE_CACHE_TTL", 6 * 3600))  # traffic-free ORS routes rarely change
+ROUTE_DB_PATH = os.environ.get("ROUTE_CACHE_DB", os.path.join(CACHE_DIR, "routes.sqlite3"))
+ROUTE_PERSIST = os.environ.get("ROUTE_CACHE_PERSIST", "1") == "1"  # share routes across workers and restarts
+ROUTE_DB_MAX_ROWS = int(os.environ.get("ROUTE_CACHE_DB_ROWS", 20000))  # whole routes per trip, oldest written go first
+GEOCODE_DB_MAX_ROWS = int(os.environ.get("GEOCODE_CACHE_DB_ROWS", 500000))
+SQLITE_PURGE_EVERY = int(os.environ.get("SQLITE_PURGE_EVERY", 500))  # writes per store between purges (0 = never)
+SQLITE_STALE_KEEP = float(os.environ.get("SQLITE_STALE_KEEP", 24 * 3600))  # expired rows kept this long for stale fallbacks
+# sqlite reads go through a shared memory map, so every worker reads from the same page cache
+SQLITE_MMAP_BYTES = int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+
+_MISSING = object()
+
+# Disk-tier writes from async code run here, one thread so they queue instead of piling up threads
+_disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache where every entry also expires after a TTL."""
+
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Key -> JSON value table on disk, shared by every worker process on the box."""
+
+    def __init__(self, path, table, ttl=3600.0, max_rows=None):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._writes = 0
+        self._local = threading.local()  # sqlite connections are per thread
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None, allow_expired=False):
+        try:
+            row = self._conn().execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache store {self.table} read failed: {e}")
+            return default
+        if row is None or (row[1] <= time.time() and not allow_expired):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            # A failed write only costs us a future miss, never fail the request for it
+            print(f"[WARN] Cache store {self.table} write failed: {e}")
+        self._writes += 1
+        if SQLITE_PURGE_EVERY and self._writes % SQLITE_PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self, stale_keep=SQLITE_STALE_KEEP):
+        """Drops rows expired for longer than stale_keep, then the oldest written ones past max_rows."""
+        try:
+            conn = self._conn()
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time() - stale_keep,))
+            if self.max_rows:
+                # Same ttl for every row of a table, so the earliest expiry is the least recently written
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache store {self.table} purge failed: {e}")
+
+
+class TieredCache:
+    """Memory LRU in front of an optional on-disk store, with hit/miss counters per tier.
+
+    encode/decode convert values that aren't plain JSON (e.g. NumPy-backed objects) for the store.
+    """
+
+    def __init__(self, name, memory, store=None, encode=None, decode=None):
+        self.name = name
+        self.memory = memory
+        self.store = store
+        self.encode = encode
+        self.decode = decode
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.memory_hits += 1
+            return value
+        return self._disk_get(key, default)
+
+    def _disk_get(self, key, default):
+        if self.store is not None:
+            value = self.store.get(key, _MISSING)
+            if value is not _MISSING:
+                self.disk_hits += 1
+                if self.decode is not None:
+                    value = self.decode(value)
+                self.memory.set(key, value)  # promote so the next lookup stays in process
+                return value
+        self.misses += 1
+        return default
+
+    # --- Async variants: the memory tier inline, sqlite + JSON off the event loop ---
+    async def aget(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.memory_hits += 1
+            return value
+        if self.store is None:
+            self.misses += 1
+            return default
+        return await asyncio.to_thread(self._disk_get, key, default)
+
+    async def aget_stale(self, key, default=None):
+        if self.store is None:
+            return default
+        return await asyncio.to_thread(self.get_stale, key, default)
+
+    def set_background(self, key, value):
+        """Memory tier now, the disk write (encode + json + sqlite) queued on the writer thread."""
+        self.memory.set(key, value)
+        if self.store is not None:
+            _disk_writer.submit(self._disk_set, key, value)
+
+    def _disk_set(self, key, value):
+        try:
+            self.store.set(key, self.encode(value) if self.encode is not None else value)
+        except Exception as e:
+            print(f"[WARN] Cache {self.name} background write failed: {e}")
+
+    def get_stale(self, key, default=None):
+        """Last stored value even if it has expired, for when the upstream is down (not counted in stats)."""
+        if self.store is None:
+            return default
+        value = self.store.get(key, _MISSING, allow_expired=True)
+        if value is _MISSING:
+            return default
+        return self.decode(value) if self.decode is not None else value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.store is not None:
+            self.store.set(key, self.encode(value) if self.encode is not None else value)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+class GeocodeCache:
+    """Forward (place name -> coords) and reverse (coords -> label) geocoding caches."""
+
+    def __init__(self, path=GEOCODE_DB_PATH, maxsize=GEOCODE_MEMORY_SIZE, ttl=GEOCODE_TTL,
+                 precision=REVERSE_PRECISION):
+        self.precision = precision
+        self.forward = TieredCache("geocode", TTLCache(maxsize, ttl), SQLiteStore(path, "geocode_forward", ttl, GEOCODE_DB_MAX_ROWS))
+        self.reverse = TieredCache("reverse_geocode", TTLCache(maxsize, ttl), SQLiteStore(path, "geocode_reverse", ttl, GEOCODE_DB_MAX_ROWS))
+
+    @staticmethod
+    def forward_key(place_name):
+        return " ".join(place_name.lower().split())
+
+    def reverse_key(self, coords):
+        # Round so points a few metres apart share one entry
+        lon, lat = coords[0], coords[1]
+        return f"{round(float(lon), self.precision):.{self.precision}f},{round(float(lat), self.precision):.{self.precision}f}"
+
+    def stats(self):
+        return {"geocode": self.forward.stats(), "reverse_geocode": self.reverse.stats()}
+
+
+class SingleFlight:
+    """Concurrent coroutines with the same key share one run of fn instead of each running it."""
+
+    def __init__(self):
+        self._calls = {}  # key -> asyncio.Task running fn
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            # fn runs detached from whoever started it, so the caller that started it disconnecting
+            # doesn't cancel the result for everybody else
+            task = asyncio.get_running_loop().create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # shield: a cancelled caller stops waiting, the task and the other waiters carry on
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved, every waiter may have gone
+
+    def stats(self):
+        return {"upstream_calls": self.leaders, "coalesced": self.shared, "in_flight": len(self._calls)}
+
+
+class RouteCache:
+    """Size-bounded, TTL-expiring cache of directions results, with request coalescing on misses.
+
+    With a path the routes are also kept in sqlite, so other workers and restarted ones start warm.
+    """
+
+    def __init__(self, maxsize=ROUTE_MEMORY_SIZE, ttl=ROUTE_TTL, path=ROUTE_DB_PATH if ROUTE_PERSIST else None,
+                 encode=None, decode=None):
+        store = SQLiteStore(path, "routes", ttl, ROUTE_DB_MAX_ROWS) if path else None
+        self.cache = TieredCache("route", TTLCache(maxsize, ttl), store, encode, decode)
+        self.flight = SingleFlight()
+
+    @staticmethod
+    def key(start_place, end_place, profile):
+        return f"{profile}|{GeocodeCache.forward_key(start_place)}|{GeocodeCache.forward_key(end_place)}"
+
+    async def get_or_fetch(self, key, fetch):
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+
+        async def fetch_and_store():
+            value = await fetch()
+            # in memory before the flight ends so late arrivals hit the cache, sqlite written in the background
+            self.cache.set_background(key, value)
+            return value
+
+        return await self.flight.do(key, fetch_and_store)
+
+    async def get_stale(self, key):
+        return await self.cache.aget_stale(key)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update(self.flight.stats())
+        return stats
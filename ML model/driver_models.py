@@ -0,0 +1,199 @@
+# Personalised TDO models: one ridge regression per driver, shrunk towards the global model so
+# drivers with few nights of data stay close to it. Drivers with too little data use the global model.
+# All coefficients live in one (drivers x 7) array, looked up by driver ID in microseconds.
+#
+#   python driver_models.py --input sleep_records.jsonl --out driver_models
+#   python driver_models.py --input Sleep_Efficiency.csv --driver-column ID --out driver_models
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sleep_features import engineer, SOURCE_COLUMNS
+from tdo_artifact import FEATURE_ORDER
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIVER_MODELS_DIR = os.environ.get("DRIVER_MODELS_DIR", os.path.join(BASE_DIR, "driver_models"))
+MIN_RECORDS = 10     # fewer nights than this -> global model
+RIDGE = 5.0          # pull towards the global coefficients, in "pseudo-nights"
+CHUNK_ROWS = 200000  # rows per worker task, bounds the (rows x 7 x 7) scratch array to ~80 MB
+
+
+def _design(X):
+    return np.column_stack((np.ones(len(X)), X))
+
+
+def fit_global(X, y, ridge=1e-6):
+    Xb = _design(X)
+    penalty = np.eye(Xb.shape[1]) * ridge
+    penalty[0, 0] = 0.0
+    return np.linalg.solve(Xb.T @ Xb + penalty, Xb.T @ y)
+
+
+def _fit_chunk(task):
+    # X/y are rows of consecutive drivers sorted by driver, starts = first row of each driver
+    X, y, starts, global_beta, ridge = task
+    Xb = _design(X)
+    xtx = np.add.reduceat(Xb[:, :, None] * Xb[:, None, :], starts, axis=0)
+    xty = np.add.reduceat(Xb * y[:, None], starts, axis=0)
+    # argmin |Xb - y|^2 + ridge |b - global|^2, solved for every driver of the chunk at once
+    A = xtx + ridge * np.eye(Xb.shape[1])
+    b = xty + ridge * global_beta
+    return np.linalg.solve(A, b[:, :, None])[:, :, 0]
+
+
+def _chunks(X, y, starts, counts, global_beta, ridge, chunk_rows):
+    first = 0
+    while first < len(starts):
+        last = first
+        rows = 0
+        while last < len(starts) and (rows == 0 or rows + counts[last] <= chunk_rows):
+            rows += counts[last]
+            last += 1
+        lo, hi = starts[first], starts[first] + rows
+        yield X[lo:hi], y[lo:hi], starts[first:last] - lo, global_beta, ridge
+        first = last
+
+
+def train_driver_models(driver_ids, X, y, min_records=MIN_RECORDS, ridge=RIDGE, workers=None,
+                        chunk_rows=CHUNK_ROWS):
+    """Returns (sorted unique ids, coefficient table [intercept, *coef] per id, record counts, global beta)."""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    driver_ids = np.asarray(driver_ids).astype(str)
+    global_beta = fit_global(X, y)
+
+    order = np.argsort(driver_ids, kind="stable")
+    ids, starts, counts = np.unique(driver_ids[order], return_index=True, return_counts=True)
+    X, y = X[order], y[order]
+
+    coefs = np.tile(global_beta, (len(ids), 1))
+    personal = counts >= min_records
+    if personal.any():
+        # Keep only rows of drivers that get their own model
+        keep = np.repeat(personal, counts)
+        p_counts = counts[personal]
+        p_starts = np.concatenate(([0], np.cumsum(p_counts)[:-1]))
+        tasks = list(_chunks(X[keep], y[keep], p_starts, p_counts, global_beta, ridge, chunk_rows))
+        if workers == 1 or len(tasks) == 1:
+            results = [_fit_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_fit_chunk, tasks))
+        coefs[personal] = np.concatenate(results)
+    return ids, coefs, counts, global_beta
+
+
+def save_driver_models(path, ids, coefs, counts, global_beta, min_records):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, "driver_ids.npy"), ids)
+    np.save(os.path.join(tmp_path, "coefs.npy"), coefs)
+    np.save(os.path.join(tmp_path, "counts.npy"), counts)
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as file:
+        json.dump({
+            "feature_order": FEATURE_ORDER,
+            "drivers": int(len(ids)),
+            "personalised": int((counts >= min_records).sum()),
+            "min_records": min_records,
+            "global_beta": global_beta.tolist(),
+            "created_at": time.time(),
+        }, file, indent=2)
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+
+
+class DriverModelStore:
+    """Memory-mapped coefficient table with an id -> row index for per-driver TDO lookups."""
+
+    def __init__(self, path=DRIVER_MODELS_DIR):
+        with open(os.path.join(path, "manifest.json")) as file:
+            self.manifest = json.load(file)
+        if self.manifest["feature_order"] != FEATURE_ORDER:
+            raise ValueError(f"{path} was trained on {self.manifest['feature_order']}, expected {FEATURE_ORDER}")
+        self.coefs = np.load(os.path.join(path, "coefs.npy"), mmap_mode="r")
+        ids = np.load(os.path.join(path, "driver_ids.npy"))
+        counts = np.load(os.path.join(path, "counts.npy"))
+        min_records = self.manifest["min_records"]
+        # Only personalised drivers are indexed, everybody else falls through to the live global model
+        self.index = {driver_id: i for i, driver_id in enumerate(ids.tolist()) if counts[i] >= min_records}
+
+    @classmethod
+    def load_if_present(cls, path=DRIVER_MODELS_DIR):
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            return None
+        store = cls(path)
+        print(f"[INFO] Loaded {len(store.index)} personalised driver models from {path}")
+        return store
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self, driver_ids):
+        """Row index per driver id, -1 where the driver has no personal model."""
+        return np.fromiter((self.index.get(str(d), -1) if d is not None else -1 for d in driver_ids),
+                           dtype=np.int64, count=len(driver_ids))
+
+    def predict(self, rows, features):
+        """Base TDO for feature rows whose personal model rows are all >= 0."""
+        beta = self.coefs[rows]
+        return beta[:, 0] + np.einsum("ij,ij->i", beta[:, 1:], np.asarray(features, dtype=np.float64))
+
+
+def load_training_data(path, driver_column):
+    if path.endswith(".jsonl"):
+        from online_tdo import record_to_row
+        ids, X, y = [], [], []
+        with open(path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                row = record_to_row(record)
+                if row is None or record.get(driver_column) is None:
+                    continue
+                ids.append(str(record[driver_column]))
+                X.append(row[0])
+                y.append(row[1])
+        return np.asarray(ids), np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+    import pandas as pd
+    df = pd.read_csv(path).dropna(subset=SOURCE_COLUMNS)
+    columns = engineer(df)
+    X = np.column_stack([columns[name] for name in FEATURE_ORDER])
+    return df[driver_column].astype(str).to_numpy(), X, columns["TDO"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one regularised TDO model per driver")
+    parser.add_argument("--input", default=os.path.join(BASE_DIR, "sleep_records.jsonl"), help=".jsonl or .csv")
+    parser.add_argument("--driver-column", help="driver id field (default userId for jsonl, ID for csv)")
+    parser.add_argument("--out", default=DRIVER_MODELS_DIR)
+    parser.add_argument("--min-records", type=int, default=MIN_RECORDS)
+    parser.add_argument("--ridge", type=float, default=RIDGE)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = parser.parse_args()
+    driver_column = args.driver_column or ("userId" if args.input.endswith(".jsonl") else "ID")
+
+    start = time.perf_counter()
+    ids, X, y = load_training_data(args.input, driver_column)
+    loaded = time.perf_counter()
+    ids, coefs, counts, global_beta = train_driver_models(ids, X, y, args.min_records, args.ridge, args.workers)
+    trained = time.perf_counter()
+    save_driver_models(args.out, ids, coefs, counts, global_beta, args.min_records)
+    print(f"[INFO] {len(X)} records, {len(ids)} drivers, {(counts >= args.min_records).sum()} personalised "
+          f"(load {loaded - start:.1f}s, train {trained - loaded:.1f}s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# Offline reverse geocoder - nearest named place from a local gazetteer, no network involved.
+# The places file (CSV or GeoJSON) is compiled once into flat arrays on disk, which the server
+# memory-maps on startup and indexes with a KD-tree. Pelias is only asked when nothing is close enough.
+#
+#   python gazetteer.py places.csv [--out gazetteer]      # CSV needs lat, lon and name/label columns
+#   python gazetteer.py places.geojson [--out gazetteer]  # Point features with a name/label property
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from route_index import EARTH_RADIUS_M
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_DIR = os.environ.get("GAZETTEER_DIR", os.path.join(BASE_DIR, "gazetteer"))
+# Further than this from every known place and the label would be misleading, ask Pelias instead
+GAZETTEER_MAX_DISTANCE_M = float(os.environ.get("GAZETTEER_MAX_DISTANCE_M", 2000))
+
+LAT_COLUMNS = ("lat", "latitude", "y")
+LON_COLUMNS = ("lon", "lng", "long", "longitude", "x")
+LABEL_COLUMNS = ("label", "name", "display_name")
+
+
+def to_unit_xyz(lon, lat):
+    """lon/lat degrees -> points on the unit sphere, so straight-line KD-tree distance tracks great-circle distance."""
+    lon, lat = np.radians(lon), np.radians(lat)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _pick(names, candidates, path):
+    lookup = {name.lower(): name for name in names}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    raise ValueError(f"{path} has none of the columns {candidates}")
+
+
+def read_places(path):
+    """(lons, lats, labels) from a CSV or GeoJSON places file, rows without a name are skipped."""
+    lons, lats, labels = [], [], []
+    if path.endswith((".geojson", ".json")):
+        with open(path) as file:
+            features = json.load(file)["features"]
+        for feature in features:
+            geometry = feature.get("geometry") or {}
+            props = feature.get("properties") or {}
+            label = next((props[key] for key in LABEL_COLUMNS if props.get(key)), None)
+            if geometry.get("type") != "Point" or not label:
+                continue
+            lons.append(geometry["coordinates"][0])
+            lats.append(geometry["coordinates"][1])
+            labels.append(str(label))
+    else:
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            lat_col = _pick(reader.fieldnames, LAT_COLUMNS, path)
+            lon_col = _pick(reader.fieldnames, LON_COLUMNS, path)
+            label_col = _pick(reader.fieldnames, LABEL_COLUMNS, path)
+            for row in reader:
+                try:
+                    lat, lon = float(row[lat_col]), float(row[lon_col])
+                except (TypeError, ValueError):
+                    continue
+                if row[label_col]:
+                    lons.append(lon)
+                    lats.append(lat)
+                    labels.append(row[label_col])
+    return np.asarray(lons, dtype=float), np.asarray(lats, dtype=float), labels
+
+
+def build(source, out_dir=GAZETTEER_DIR):
+    """Compile a places file into points.npy (unit xyz), labels.bin + offsets.npy and a manifest."""
+    lons, lats, labels = read_places(source)
+    if not labels:
+        raise ValueError(f"No named places found in {source}")
+    encoded = [label.encode("utf-8") for label in labels]
+    offsets = np.concatenate(([0], np.cumsum([len(label) for label in encoded]))).astype(np.int64)
+
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, "points.npy"), to_unit_xyz(lons, lats))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "labels.bin"), "wb") as file:
+        file.write(b"".join(encoded))
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as file:
+        json.dump({"source": os.path.basename(source), "places": len(labels), "created_at": time.time()}, file, indent=2)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return len(labels)
+
+
+class Gazetteer:
+    """Memory-mapped places with a KD-tree on top, answers many coordinates per call."""
+
+    def __init__(self, path=GAZETTEER_DIR, max_distance_m=GAZETTEER_MAX_DISTANCE_M):
+        self.path = path
+        self.max_distance_m = max_distance_m
+        self.points = np.load(os.path.join(path, "points.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.labels = np.memmap(os.path.join(path, "labels.bin"), dtype=np.uint8, mode="r")
+        # scipy.spatial is only imported once there is an index, it costs ~0.6 s of server start otherwise
+        from scipy.spatial import cKDTree
+        # Built over the mapped array without copying it, the page cache is shared between workers
+        self.tree = cKDTree(self.points, copy_data=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load_if_present(cls, path=GAZETTEER_DIR):
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            return None
+        start = time.perf_counter()
+        gazetteer = cls(path)
+        print(f"[INFO] Loaded gazetteer with {len(gazetteer)} places from {path} "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return gazetteer
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def label(self, i):
+        return bytes(self.labels[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def lookup(self, coords):
+        """Nearest place label for each (lon, lat), None where nothing is within max_distance_m."""
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        if len(coords) == 0:
+            return []
+        # Surface distance in metres -> straight-line (chord) distance on the unit sphere
+        max_chord = 2 * np.sin(min(self.max_distance_m / EARTH_RADIUS_M, np.pi) / 2)
+        chord, idx = self.tree.query(to_unit_xyz(coords[:, 0], coords[:, 1]), distance_upper_bound=max_chord)
+        found = np.isfinite(chord)
+        with self._lock:
+            self.hits += int(found.sum())
+            self.misses += int(len(found) - found.sum())
+        return [self.label(i) if ok else None for i, ok in zip(idx.tolist(), found.tolist())]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"places": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a places file into the offline reverse-geocoding index")
+    parser.add_argument("source", help="CSV (lat, lon, name/label columns) or GeoJSON of Point features")
+    parser.add_argument("--out", default=GAZETTEER_DIR)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = build(args.source, args.out)
+    print(f"[INFO] {count} places -> {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import base64
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _to_local_metres(coords):
+    # Equirectangular projection around the route's mean latitude, plenty for DP tolerances in metres
+    lat0 = np.radians(coords[:, 1].mean())
+    x = np.radians(coords[:, 0]) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(coords[:, 1]) * EARTH_RADIUS_M
+    return np.column_stack((x, y))
+
+
+def simplify(coords, tolerance_m):
+    """Douglas-Peucker simplification of an (n, 2) lon/lat array, tolerance in metres."""
+    coords = np.asarray(coords, dtype=float)
+    return coords[simplify_mask(coords, tolerance_m)]
+
+
+def simplify_mask(coords, tolerance_m):
+    """Boolean mask of the vertices Douglas-Peucker keeps, for lining up per-vertex data."""
+    coords = np.asarray(coords, dtype=float)
+    n = len(coords)
+    if n < 3 or tolerance_m is None or tolerance_m <= 0:
+        return np.ones(n, dtype=bool)
+
+    points = _to_local_metres(coords)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        # Perpendicular distance of every inner point to the chord, in one NumPy pass
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        chord = b - a
+        chord_len = np.hypot(chord[0], chord[1])
+        if chord_len == 0:
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(chord[0] * (inner[:, 1] - a[1]) - chord[1] * (inner[:, 0] - a[0])) / chord_len
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def encode_polyline(coords, precision=5):
+    """Google encoded polyline of an (n, 2) lon/lat array (the format itself is lat, lng)."""
+    coords = np.asarray(coords, dtype=float)
+    if len(coords) == 0:
+        return ""
+    scaled = np.round(coords[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Zig-zag sign encoding, then 5-bit chunks with a continuation bit
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    out = []
+    for value in values.tolist():
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return "".join(out)
+
+
+def pack_float32(values):
+    """Base64 of a little-endian float32 array, decodable with one Float32Array on the app side."""
+    return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode("ascii")
+
+
+def encode_route(coords, encoding, tolerance_m=None):
+    """routeGeometry payload for the requested encoding ("polyline" or "float32")."""
+    coords = simplify(coords, tolerance_m)
+    geometry = {"encoding": encoding, "count": len(coords)}
+    if encoding == "polyline":
+        geometry["precision"] = 5
+        geometry["data"] = encode_polyline(coords, precision=5)
+    elif encoding == "float32":
+        geometry["order"] = "lat,lng"
+        geometry["data"] = pack_float32(coords[:, ::-1])
+    else:
+        raise ValueError(f"Unknown route encoding: {encoding}")
+    return geometry
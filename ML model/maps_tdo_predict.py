@@ -1,29 +1,13 @@
 import openrouteservice
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
 import joblib
+from tdo_artifact import FEATURE_ORDER, export_artifact
+from sleep_features import train_model
 
 def TDO_Model():
     # --- Sleep TDO prediction setup ---
-    df = pd.read_csv("Sleep_Efficiency.csv")
-
-    df = df[["Age", "Sleep duration", "Sleep efficiency", "REM sleep percentage", "Deep sleep percentage", "Light sleep percentage", "Awakenings"]]
-    df = df.dropna()
-
-    df["Deep/Total"] = df["Deep sleep percentage"] / 100
-    df["REM/Total"] = df["REM sleep percentage"] / 100
-    df["Light/Total"] = df["Light sleep percentage"] / 100
-
-    X = df[["Age", "Sleep efficiency", "Deep/Total", "REM/Total", "Light/Total", "Awakenings"]]
-    y = df["Sleep duration"] * (0.5 + df["Deep/Total"] * 0.5 + df["REM/Total"] * 0.3) * np.power(df["Sleep efficiency"] / 100, 1.5) / (0.1 + df["Awakenings"] * 0.2)
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    model = LinearRegression()
-
-    model.fit(X_train, y_train)
+    # Features + TDO target come from the shared pipeline (sleep_features.py), cached after the first run
+    model, X_test, y_test = train_model("Sleep_Efficiency.csv")
     # --- Logged sleep data ---
     sample = [25, 85, 0.1, 0.20, 0.60, 1, 8]  # Age, Efficiency, Deep, REM, Light, Awakenings, Duration
     features = np.array(sample[:-1]).reshape(1, -1)
@@ -34,6 +18,9 @@ def TDO_Model():
     # Save the trained model to a file
     joblib.dump(model, "tdo_model.pkl")
     print("Model saved as 'tdo_model.pkl'")
+    # Coefficients only, this is what server.py loads (no scikit-learn needed there)
+    artifact = export_artifact(model, "tdo_model.json", feature_order=FEATURE_ORDER)
+    print(f"Artifact {artifact['version']} saved as 'tdo_model.json'")
 
 def get_coordinates(place_name):
         result = client.pelias_search(text=place_name)
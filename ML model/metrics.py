@@ -0,0 +1,290 @@
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from cache hits (sub-ms) up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# --- Multi-worker Aggregation ---
+# serve.py points every worker at one directory: each worker writes its samples there every
+# METRICS_FLUSH_EVERY seconds and /metrics merges all the files, whichever worker answers the scrape
+METRICS_DIR = os.environ.get("TDO_METRICS_DIR")
+METRICS_FLUSH_EVERY = float(os.environ.get("TDO_METRICS_FLUSH_EVERY", 1.0))
+METRICS_STALE_AFTER = 3 * METRICS_FLUSH_EVERY  # gauges of a worker that stopped writing are dropped
+
+_registry = []
+_lock = threading.Lock()  # one short critical section per update, cheap enough to leave on
+_collectors = []          # called before every render/snapshot, e.g. to copy the caches' own counters in
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        with _lock:
+            _registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with _lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self, children, labelnames):
+        raise NotImplementedError
+
+    def render(self, children=None, labelnames=None):
+        """children: (label values, value) pairs to print instead of this process's own."""
+        if children is None:
+            children = list(self._children.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(children, labelnames or self.labelnames))
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with _lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with _lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def _samples(self, children, labelnames):
+        for values, child in children:
+            yield f"{self.name}{_format_labels(labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1.0):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _samples(self, children, labelnames):
+        for values, child in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(labelnames, values, le)} {cumulative}"
+            labels = _format_labels(labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def add_collector(fn):
+    """fn() runs before every render and snapshot, to refresh metrics that are copied in from elsewhere."""
+    _collectors.append(fn)
+
+
+def _collect():
+    for fn in _collectors:
+        fn()
+
+
+def _dump(child):
+    if isinstance(child, _HistogramValue):
+        return {"counts": list(child.counts), "sum": child.sum}
+    return child.value
+
+
+def snapshot(info=None):
+    """This process's samples as plain JSON, plus whatever `info` it wants the other workers to see."""
+    _collect()
+    return {
+        "pid": os.getpid(), "time": time.time(), "info": info,
+        "metrics": {metric.name: [[list(values), _dump(child)] for values, child in list(metric._children.items())]
+                    for metric in list(_registry)},
+    }
+
+
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f"worker-{pid or os.getpid()}.json")
+
+
+def write_snapshot(info=None):
+    tmp_path = _snapshot_path() + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(snapshot(info), file)
+    os.replace(tmp_path, _snapshot_path())
+
+
+def read_snapshots():
+    """Every worker's last snapshot, including workers that have exited (their counters still count)."""
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "worker-*.json")):
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue  # removed or half written, the next scrape picks it up
+    return snapshots
+
+
+def worker_info():
+    """pid -> info of every worker that has written a snapshot recently."""
+    now = time.time()
+    return {str(snap["pid"]): snap["info"] for snap in read_snapshots()
+            if now - snap["time"] <= METRICS_STALE_AFTER}
+
+
+def _merged(metric, snapshots, now):
+    """Counters and histograms are summed over all workers; gauges are per live worker (`worker` label)."""
+    children = {}
+    is_gauge = isinstance(metric, Gauge)
+    for snap in snapshots:
+        if is_gauge and now - snap["time"] > METRICS_STALE_AFTER:
+            continue
+        for values, data in snap["metrics"].get(metric.name, []):
+            key = tuple(values) + ((str(snap["pid"]),) if is_gauge else ())
+            if isinstance(metric, Histogram):
+                child = children.setdefault(key, _HistogramValue(metric.buckets))
+                child.counts = [a + b for a, b in zip(child.counts, data["counts"])]
+                child.sum += data["sum"]
+            else:
+                child = children.setdefault(key, _Value())
+                child.value += data
+    labelnames = metric.labelnames + (("worker",) if is_gauge else ())
+    return sorted(children.items()), labelnames
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4).
+
+    With METRICS_DIR set this is the sum over every worker's last snapshot, this one's taken now.
+    """
+    if not METRICS_DIR:
+        _collect()
+        return "\n".join(metric.render() for metric in list(_registry)) + "\n"
+    own = snapshot()
+    snapshots = [snap for snap in read_snapshots() if snap["pid"] != own["pid"]] + [own]
+    now = time.time()
+    return "\n".join(metric.render(*_merged(metric, snapshots, now)) for metric in list(_registry)) + "\n"
+
+
+class SnapshotWriter:
+    """Background thread writing this worker's snapshot to METRICS_DIR every METRICS_FLUSH_EVERY seconds."""
+
+    def __init__(self, info=None, every=METRICS_FLUSH_EVERY):
+        self.info = info  # optional callable, its result is stored with the samples (e.g. /cacheStats)
+        self.every = every
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self):
+        try:
+            write_snapshot(self.info() if self.info else None)
+        except OSError as e:
+            print(f"[WARN] Could not write metrics snapshot: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.every):
+            self.flush()
+
+    def start(self):
+        if not METRICS_DIR:
+            return False
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.flush()  # Final counters stay in the directory after this worker exits
+
+
+# --- Server metrics ---
+REQUESTS = Counter("tdo_requests_total", "HTTP requests handled", ("path", "status"))
+REQUEST_SECONDS = Histogram("tdo_request_duration_seconds", "HTTP request latency", ("path",))
+IN_FLIGHT = Gauge("tdo_in_flight_requests", "HTTP requests currently being handled")
+STAGE_SECONDS = Histogram("tdo_stage_duration_seconds", "Time spent per request stage", ("stage",))
+UPSTREAM_CALLS = Counter("tdo_upstream_requests_total", "Calls made to the routing provider", ("call",))
+UPSTREAM_ERRORS = Counter("tdo_upstream_errors_total", "Failed calls to the routing provider", ("call",))
+UPSTREAM_RETRIES = Counter("tdo_upstream_retries_total", "Upstream calls retried after a failure or timeout", ("call",))
+UPSTREAM_HEDGES = Counter("tdo_upstream_hedges_total", "Duplicate upstream requests sent after the hedge delay", ("call",))
+UPSTREAM_FALLBACKS = Counter("tdo_upstream_fallbacks_total", "Failed upstream calls answered from stale cache or degraded",
+                             ("call", "kind"))
+BREAKER_STATE = Gauge("tdo_circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ("call",))
+BREAKER_OPENS = Counter("tdo_circuit_breaker_opens_total", "Times the circuit breaker has tripped open", ("call",))
+# Cache numbers are copied from the caches' own counters when /metrics is scraped
+CACHE_LOOKUPS = Counter("tdo_cache_lookups_total", "Cache lookups by result", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge("tdo_cache_hit_ratio", "Cache hits / lookups since start", ("cache",))
+COALESCED = Counter("tdo_route_coalesced_total", "Route requests that waited on an identical in-flight fetch")
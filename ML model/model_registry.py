@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+
+from tdo_artifact import LinearTDOModel, load_artifact
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_PATH = os.path.join(BASE_DIR, "tdo_model.json")
+PICKLE_PATH = os.path.join(BASE_DIR, "tdo_model.pkl")
+
+# --- Registry Configuration (override with env vars when deploying) ---
+# The NumPy artifact is preferred, the pickle is only a fallback (it pulls in scikit-learn)
+MODEL_PATH = os.environ.get("TDO_MODEL_PATH", ARTIFACT_PATH if os.path.exists(ARTIFACT_PATH) else PICKLE_PATH)
+# Optional directory of versioned models (e.g. models/2025-04-26.json); the newest file wins
+MODEL_DIR = os.environ.get("TDO_MODEL_DIR")
+POLL_INTERVAL = float(os.environ.get("TDO_MODEL_POLL_SECONDS", 5.0))
+MODEL_EXTENSIONS = (".json", ".pkl")
+
+
+class LoadedModel:
+    """One immutable snapshot of a loaded model and where it came from."""
+
+    def __init__(self, model, version, path, sha256, loaded_at):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.sha256 = sha256
+        self.loaded_at = loaded_at
+
+
+class ModelRegistry:
+    """Keeps the TDO model resident and swaps in new versions from disk."""
+
+    def __init__(self, path=MODEL_PATH, model_dir=MODEL_DIR, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.model_dir = model_dir
+        self.poll_interval = poll_interval
+        self._current = None
+        self._fingerprint = None
+        self._reload_lock = threading.Lock()  # only reloads take it, readers never block
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Locating the model file ---
+    def _resolve_path(self):
+        if not self.model_dir:
+            return self.path
+        candidates = []
+        for name in os.listdir(self.model_dir):
+            # Skip hidden / half-written files, writers should os.replace() into place
+            if name.startswith(".") or not name.endswith(MODEL_EXTENSIONS):
+                continue
+            full = os.path.join(self.model_dir, name)
+            candidates.append((os.stat(full).st_mtime_ns, name, full))
+        if not candidates:
+            raise FileNotFoundError(f"No model files found in {self.model_dir}")
+        return max(candidates)[2]
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    # --- Loading / swapping ---
+    def _read_model(self, path):
+        with open(path, "rb") as file:
+            raw = file.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if path.endswith(".json"):
+            model = load_artifact(path)
+            return model, sha256, model.version
+        # Legacy pickle: deferred import, and the sklearn model is reduced to its coefficients
+        import pickle
+        model = pickle.loads(raw)
+        if hasattr(model, "coef_"):
+            model = LinearTDOModel(model.coef_, model.intercept_)
+        return model, sha256, None
+
+    def load(self):
+        with self._reload_lock:
+            path = self._resolve_path()
+            fingerprint = self._stat(path)
+            model, sha256, version = self._read_model(path)
+            if version is None:
+                version = os.path.splitext(os.path.basename(path))[0] if self.model_dir else sha256[:12]
+            # Single reference assignment, in-flight requests keep the snapshot they already hold
+            self._current = LoadedModel(model, version, path, sha256, time.time())
+            self._fingerprint = fingerprint
+            return self._current
+
+    def reload_if_changed(self):
+        try:
+            fingerprint = self._stat(self._resolve_path())
+        except OSError as e:
+            print(f"[WARN] Model registry could not stat model: {e}")
+            return False
+        if fingerprint == self._fingerprint:
+            return False
+        try:
+            loaded = self.load()
+        except Exception as e:
+            # Keep serving the old model if the new file is broken or mid-write
+            print(f"[WARN] Failed to load new model, keeping version {self.version}: {e}")
+            return False
+        print(f"[INFO] Swapped in TDO model version {loaded.version}")
+        return True
+
+    def current(self):
+        snapshot = self._current
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    @property
+    def model(self):
+        return self.current().model
+
+    @property
+    def version(self):
+        return self._current.version if self._current else None
+
+    def info(self):
+        snapshot = self.current()
+        return {
+            "version": snapshot.version,
+            "sha256": snapshot.sha256,
+            "path": snapshot.path,
+            "loaded_at": snapshot.loaded_at,
+            "loaded_at_iso": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(snapshot.loaded_at)),
+        }
+
+    # --- Background watcher ---
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+    def start(self):
+        if self._current is None:
+            self.load()
+            print(f"[INFO] Loaded TDO model version {self.version}")
+        if self._thread is None and self.poll_interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="tdo-model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
@@ -0,0 +1,181 @@
+# Incremental TDO training from a stream of sleep records.
+# Keeps the running sufficient statistics of the least-squares fit (X'X, X'y), so each mini-batch
+# updates the model in O(batch) without another pass over history, and the result is the same
+# regression a full retrain would give. New versions are published as artifacts into the model
+# directory the server's registry watches (TDO_MODEL_DIR).
+#
+#   python online_tdo.py --feed sleep_records.jsonl --seed-csv Sleep_Efficiency.csv
+#
+# The feed is a JSONL stand-in for the Node `POST /:userId/record` route, one Sleep document per line:
+#   {"userId": "...", "remSleepPercentage": 20, "deepSleepPercentage": 55, "lightSleep": 25,
+#    "totalSleepDuration": 7.5, "timeOfSleep": "2025-04-26T22:00:00Z",
+#    "age": 31, "sleepEfficiency": 0.86, "awakenings": 1}
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from sleep_features import load_features, tdo_target
+from tdo_artifact import FEATURE_ORDER, LinearTDOModel, export_artifact
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.environ.get("TDO_MODEL_DIR", os.path.join(BASE_DIR, "models"))
+CHECKPOINT_PATH = os.environ.get("TDO_ONLINE_CHECKPOINT", os.path.join(BASE_DIR, ".cache", "online_tdo.npz"))
+RIDGE = 1e-6  # keeps the solve stable before the feed has covered every feature direction
+
+
+class OnlineTDOModel:
+    """Running X'X / X'y for the TDO linear regression (with intercept), solvable at any time."""
+
+    def __init__(self, n_features=len(FEATURE_ORDER)):
+        size = n_features + 1
+        self.xtx = np.zeros((size, size))
+        self.xty = np.zeros(size)
+        self.count = 0
+        self.feed_offset = 0  # bytes of the feed already consumed
+
+    def update(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(X) == 0:
+            return
+        Xb = np.column_stack((np.ones(len(X)), X))
+        self.xtx += Xb.T @ Xb
+        self.xty += Xb.T @ y
+        self.count += len(X)
+
+    def solve(self, ridge=RIDGE):
+        penalty = np.eye(len(self.xty)) * ridge
+        penalty[0, 0] = 0.0  # never shrink the intercept
+        beta = np.linalg.solve(self.xtx + penalty, self.xty)
+        return LinearTDOModel(beta[1:], beta[0])
+
+    # --- Checkpointing ---
+    def save(self, path=CHECKPOINT_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, xtx=self.xtx, xty=self.xty, count=self.count, feed_offset=self.feed_offset)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CHECKPOINT_PATH):
+        state = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                state.xtx = data["xtx"]
+                state.xty = data["xty"]
+                state.count = int(data["count"])
+                state.feed_offset = int(data["feed_offset"])
+        return state
+
+
+def record_to_row(record):
+    """Sleep document -> (features in FEATURE_ORDER, TDO target), or None if it can't be used."""
+    try:
+        duration = float(record["totalSleepDuration"])
+        efficiency = float(record["sleepEfficiency"])
+        deep = float(record["deepSleepPercentage"]) / 100
+        rem = float(record["remSleepPercentage"]) / 100
+        light = float(record["lightSleep"]) / 100
+        awakenings = float(record["awakenings"])  # no default, 0 would inflate the target ~3x
+        age = float(record["age"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    features = [age, efficiency, deep, rem, light, awakenings]
+    return features, tdo_target(duration, deep, rem, efficiency, awakenings)
+
+
+def read_feed(path, offset, max_records):
+    """New complete lines of the JSONL feed after byte `offset` -> (X, y, new offset, skipped)."""
+    X, y, skipped = [], [], 0
+    if not os.path.exists(path):
+        return X, y, offset, skipped
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while len(X) < max_records:
+            line = file.readline()
+            if not line or not line.endswith(b"\n"):
+                break  # partial line, the writer isn't done with it yet
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                row = record_to_row(json.loads(line))
+            except json.JSONDecodeError:
+                row = None
+            if row is None:
+                skipped += 1
+                continue
+            X.append(row[0])
+            y.append(row[1])
+    return X, y, offset, skipped
+
+
+def publish(state, models_dir=MODELS_DIR):
+    os.makedirs(models_dir, exist_ok=True)
+    version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-online-{state.count}"
+    path = os.path.join(models_dir, f"{version}.json")
+    export_artifact(state.solve(), path, version=version, extra={"trained_records": state.count})
+    print(f"[INFO] Published TDO model {version} ({state.count} records)")
+    return path
+
+
+def run(args):
+    state = OnlineTDOModel.load(args.checkpoint)
+    if state.count == 0 and args.seed_csv:
+        features = load_features(args.seed_csv)
+        state.update(features.X, features.y)
+        print(f"[INFO] Seeded with {len(features)} historical records from {args.seed_csv}")
+        publish(state, args.models_dir)
+        state.save(args.checkpoint)
+
+    since_checkpoint = since_publish = 0
+    last_checkpoint = time.monotonic()
+    while True:
+        X, y, state.feed_offset, skipped = read_feed(args.feed, state.feed_offset, args.batch_size)
+        if skipped:
+            print(f"[WARN] Skipped {skipped} sleep records missing model fields")
+        if X:
+            state.update(X, y)
+            since_checkpoint += len(X)
+            since_publish += len(X)
+
+        if since_publish >= args.publish_every:
+            publish(state, args.models_dir)
+            since_publish = 0
+        if since_checkpoint and (since_checkpoint >= args.checkpoint_every
+                                 or time.monotonic() - last_checkpoint >= args.checkpoint_seconds):
+            state.save(args.checkpoint)
+            since_checkpoint = 0
+            last_checkpoint = time.monotonic()
+
+        if len(X) < args.batch_size:
+            if args.once:
+                break
+            time.sleep(args.poll)  # caught up with the feed
+
+    if since_publish:
+        publish(state, args.models_dir)
+    state.save(args.checkpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally train the TDO model from streamed sleep records")
+    parser.add_argument("--feed", default=os.path.join(BASE_DIR, "sleep_records.jsonl"))
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--seed-csv", help="historical CSV to start from when there is no checkpoint yet")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--publish-every", type=int, default=1000, help="records between published versions")
+    parser.add_argument("--checkpoint-every", type=int, default=1000)
+    parser.add_argument("--checkpoint-seconds", type=float, default=60.0)
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds to wait once the feed is drained")
+    parser.add_argument("--once", action="store_true", help="drain the feed, publish and exit")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
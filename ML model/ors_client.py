@@ -0,0 +1,56 @@
+import os
+
+import httpx
+
+from routing_backend import RoutingBackend
+
+# --- OpenRouteService Configuration (override with env vars when deploying) ---
+ORS_API_KEY = os.environ.get("ORS_API_KEY")  # required, never commit a key
+ORS_BASE_URL = os.environ.get("ORS_BASE_URL", "https://api.openrouteservice.org")
+ORS_TIMEOUT = float(os.environ.get("ORS_TIMEOUT", 10.0))  # seconds, whole request
+ORS_CONNECT_TIMEOUT = float(os.environ.get("ORS_CONNECT_TIMEOUT", 3.0))
+ORS_MAX_CONNECTIONS = int(os.environ.get("ORS_MAX_CONNECTIONS", 100))
+ORS_MAX_KEEPALIVE = int(os.environ.get("ORS_MAX_KEEPALIVE", 20))
+
+
+class AsyncOrsClient(RoutingBackend):
+    """Async stand-in for openrouteservice.Client sharing one pooled HTTP connection set.
+
+    Method names and return values match the openrouteservice package so the
+    server code reads the same, the calls just need an await.
+    """
+
+    def __init__(self, key=ORS_API_KEY, base_url=ORS_BASE_URL, timeout=ORS_TIMEOUT,
+                 connect_timeout=ORS_CONNECT_TIMEOUT, max_connections=ORS_MAX_CONNECTIONS,
+                 max_keepalive=ORS_MAX_KEEPALIVE):
+        if not key:
+            # Fail at startup rather than serving synthetic routes or 401s as if they were real
+            raise RuntimeError("ORS_API_KEY is not set; export it, or use ROUTING_BACKEND=local for offline testing")
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": key, "Accept": "application/json, application/geo+json"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+        )
+
+    async def _get(self, path, params):
+        response = await self._http.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def pelias_search(self, text, size=1):
+        return await self._get("/geocode/search", {"text": text, "size": size})
+
+    async def pelias_reverse(self, point, size=1):
+        return await self._get("/geocode/reverse", {"point.lon": point[0], "point.lat": point[1], "size": size})
+
+    async def directions(self, coordinates, profile="driving-car", format="geojson"):
+        response = await self._http.post(
+            f"/v2/directions/{profile}/{format}",
+            json={"coordinates": [list(coord) for coord in coordinates]},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self._http.aclose()
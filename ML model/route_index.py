@@ -0,0 +1,128 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres, works element-wise on arrays."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class RouteIndex:
+    """Cumulative distance/time along a route polyline, for position-at-time lookups.
+
+    ORS vertices are not evenly spaced in time (motorway vs. city streets), so
+    each step's duration is spread over its own vertices by distance and the
+    lookup binary-searches the cumulative time array.
+    """
+
+    def __init__(self, coords, cum_dist, cum_time):
+        self.coords = coords        # (n, 2) lon, lat
+        self.cum_dist = cum_dist    # (n,) metres from start
+        self.cum_time = cum_time    # (n,) seconds from start
+
+    @classmethod
+    def from_geojson(cls, route):
+        feature = route['features'][0]
+        coords = np.asarray(feature['geometry']['coordinates'], dtype=float)[:, :2]
+        segments = feature['properties'].get('segments', [])
+
+        edge_len = haversine_m(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+        edge_time = np.full(edge_len.shape, np.nan)
+
+        # --- Spread each step's duration over the edges it covers, by edge length ---
+        for segment in segments:
+            for step in segment.get('steps', []):
+                a, b = step['way_points']
+                if b <= a:
+                    continue
+                lengths = edge_len[a:b]
+                total = lengths.sum()
+                share = lengths / total if total > 0 else np.full(b - a, 1.0 / (b - a))
+                edge_time[a:b] = step['duration'] * share
+
+        # --- Edges without step info move at the route's average speed ---
+        missing = np.isnan(edge_time)
+        if missing.any():
+            total_duration = sum(segment.get('duration', 0.0) for segment in segments)
+            known_time = edge_time[~missing].sum()
+            missing_len = edge_len[missing].sum()
+            remaining = max(total_duration - known_time, 0.0)
+            if missing_len > 0:
+                edge_time[missing] = edge_len[missing] * (remaining / missing_len)
+            else:
+                edge_time[missing] = 0.0
+
+        cum_dist = np.concatenate(([0.0], np.cumsum(edge_len)))
+        cum_time = np.concatenate(([0.0], np.cumsum(edge_time)))
+        return cls(coords, cum_dist, cum_time)
+
+    def to_dict(self):
+        return {"coords": self.coords.tolist(), "cum_dist": self.cum_dist.tolist(), "cum_time": self.cum_time.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            np.asarray(data["coords"], dtype=float).reshape(-1, 2),
+            np.asarray(data["cum_dist"], dtype=float),
+            np.asarray(data["cum_time"], dtype=float),
+        )
+
+    @property
+    def total_time(self):
+        return float(self.cum_time[-1])
+
+    @property
+    def total_distance(self):
+        return float(self.cum_dist[-1])
+
+    def positions_at(self, seconds):
+        """Interpolated (lon, lat) for each elapsed time in seconds, plus a mask of times still on the route."""
+        t = np.atleast_1d(np.asarray(seconds, dtype=float))
+        on_route = t <= self.cum_time[-1]
+        t = np.clip(t, 0.0, self.cum_time[-1])
+        if len(self.coords) < 2:
+            return np.repeat(self.coords[:1], len(t), axis=0), on_route
+
+        # side='right' - 1 gives the edge whose start time is <= t
+        i = np.clip(np.searchsorted(self.cum_time, t, side='right') - 1, 0, len(self.coords) - 2)
+        t0, t1 = self.cum_time[i], self.cum_time[i + 1]
+        span = t1 - t0
+        frac = np.divide(t - t0, span, out=np.zeros_like(t), where=span > 0)
+        positions = self.coords[i] + frac[:, None] * (self.coords[i + 1] - self.coords[i])
+        return positions, on_route
+
+    def position_at(self, seconds):
+        """(lon, lat) after `seconds` of driving, or None once the route is already finished."""
+        positions, on_route = self.positions_at(seconds)
+        if not on_route[0]:
+            return None
+        return positions[0].tolist()
+
+
+def fatigue_timeline(index, tdo_hours, rest_interval_hours=None, max_rest_points=10):
+    """Fatigue risk at every vertex plus the recommended rest stops, without touching any API.
+
+    Rest stops are at the TDO and then every `rest_interval_hours` (default: another TDO) until the
+    route ends. Risk is driving time since the last rest as a fraction of the TDO, capped at 1.
+    Returns (risk per vertex, rest times in s, rest (lon, lat) positions, rest distances in m).
+    """
+    elapsed = index.cum_time
+    tdo_s = tdo_hours * 3600
+    if tdo_s <= 0:
+        empty = np.empty(0)
+        return np.ones(len(elapsed)), empty, np.empty((0, 2)), empty
+
+    interval_s = tdo_s if rest_interval_hours is None else rest_interval_hours * 3600
+    count = int(min(max_rest_points, max(0.0, np.floor((index.total_time - tdo_s) / interval_s) + 1)))
+    rest_times = tdo_s + interval_s * np.arange(count, dtype=float)
+
+    # Start of the current stint for every vertex: the last rest at or before it, else departure
+    stint_start = np.concatenate(([0.0], rest_times))[np.searchsorted(rest_times, elapsed, side='right')]
+    risk = np.clip((elapsed - stint_start) / tdo_s, 0.0, 1.0)
+
+    positions, _ = index.positions_at(rest_times)
+    distances = np.interp(rest_times, index.cum_time, index.cum_dist)
+    return risk, rest_times, positions[:count], distances
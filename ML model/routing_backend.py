@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+
+# --- Backend Selection (override with env vars) ---
+ROUTING_BACKEND = os.environ.get("ROUTING_BACKEND", "ors")  # "ors" or "local"
+LOCAL_RECORDINGS = os.environ.get("LOCAL_BACKEND_RECORDINGS")  # optional JSON file of recorded responses
+# Injected latency in ms, either one number for every call or "geocode=40,reverse=40,directions=150"
+LOCAL_LATENCY_MS = os.environ.get("LOCAL_BACKEND_LATENCY_MS", "0")
+LOCAL_JITTER = float(os.environ.get("LOCAL_BACKEND_JITTER", 0.1))  # +/- fraction of the latency
+
+# Synthetic places land inside this box (around Delhi NCR), lon/lat
+SYNTHETIC_BBOX = (76.8, 28.3, 77.6, 28.9)
+SYNTHETIC_SPEED_KMH = 45.0
+SYNTHETIC_VERTICES_PER_KM = 8
+SYNTHETIC_STEP_KM = 2.0
+
+
+class RoutingBackend:
+    """Geocode / reverse geocode / directions, with the openrouteservice method names and response shapes."""
+
+    async def pelias_search(self, text, size=1):
+        raise NotImplementedError
+
+    async def pelias_reverse(self, point, size=1):
+        raise NotImplementedError
+
+    async def directions(self, coordinates, profile="driving-car", format="geojson"):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+def parse_latency(spec):
+    """"120" -> 0.12s for every call, "geocode=40,directions=150" -> per call type, in seconds."""
+    spec = str(spec).strip()
+    if not spec:
+        return {}
+    if "=" not in spec:
+        seconds = float(spec) / 1000.0
+        return {"geocode": seconds, "reverse": seconds, "directions": seconds}
+    latency = {}
+    for part in spec.split(","):
+        name, value = part.split("=", 1)
+        latency[name.strip()] = float(value) / 1000.0
+    return latency
+
+
+class LocalBackend(RoutingBackend):
+    """In-process stand-in for ORS that serves recorded or synthetic GeoJSON after an injected delay.
+
+    Recordings are a JSON file shaped like
+    {"geocode": {"<text>": <pelias response>}, "reverse": {"<lon>,<lat>": ...}, "directions": {"<from>|<to>": ...}}
+    where coordinates in keys are rounded to 4 decimals. Anything not recorded is synthesised
+    deterministically, so the same request always gets the same answer.
+    """
+
+    def __init__(self, recordings=LOCAL_RECORDINGS, latency=LOCAL_LATENCY_MS, jitter=LOCAL_JITTER, seed=None):
+        self.recordings = {"geocode": {}, "reverse": {}, "directions": {}}
+        if recordings:
+            with open(recordings) as file:
+                self.recordings.update(json.load(file))
+        self.latency = parse_latency(latency) if not isinstance(latency, dict) else latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.calls = {"geocode": 0, "reverse": 0, "directions": 0}
+
+    async def _delay(self, kind):
+        self.calls[kind] += 1
+        seconds = self.latency.get(kind, 0.0)
+        if seconds > 0:
+            seconds *= 1.0 + self._random.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(seconds)
+
+    @staticmethod
+    def _point_key(point):
+        return f"{point[0]:.4f},{point[1]:.4f}"
+
+    # --- Synthetic responses ---
+    @staticmethod
+    def _synthetic_coords(text):
+        digest = hashlib.sha256(" ".join(text.lower().split()).encode()).digest()
+        fx = int.from_bytes(digest[:4], "big") / 2 ** 32
+        fy = int.from_bytes(digest[4:8], "big") / 2 ** 32
+        min_lon, min_lat, max_lon, max_lat = SYNTHETIC_BBOX
+        return [round(min_lon + fx * (max_lon - min_lon), 6), round(min_lat + fy * (max_lat - min_lat), 6)]
+
+    @staticmethod
+    def _synthetic_route(start, end):
+        lon1, lat1 = start[:2]
+        lon2, lat2 = end[:2]
+        dx = (lon2 - lon1) * 111.32 * math.cos(math.radians((lat1 + lat2) / 2))
+        dy = (lat2 - lat1) * 110.57
+        # Roads aren't straight, stretch the crow-flies distance a bit
+        distance_km = max(math.hypot(dx, dy) * 1.3, 0.05)
+        n = max(2, int(distance_km * SYNTHETIC_VERTICES_PER_KM))
+        coords = []
+        for i in range(n):
+            f = i / (n - 1)
+            wiggle = 0.002 * math.sin(f * math.pi * 6)  # some bends so simplification has work to do
+            coords.append([lon1 + (lon2 - lon1) * f + wiggle, lat1 + (lat2 - lat1) * f - wiggle])
+
+        duration = distance_km / SYNTHETIC_SPEED_KMH * 3600
+        n_steps = max(1, int(distance_km // SYNTHETIC_STEP_KM))
+        bounds = [round(i * (n - 1) / n_steps) for i in range(n_steps + 1)]
+        steps = []
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            share = (b - a) / (n - 1)
+            steps.append({"distance": distance_km * 1000 * share, "duration": duration * share, "way_points": [a, b]})
+
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": coords},
+                "properties": {
+                    "segments": [{"distance": distance_km * 1000, "duration": duration, "steps": steps}],
+                    "summary": {"distance": distance_km * 1000, "duration": duration},
+                    "way_points": [0, n - 1],
+                },
+            }],
+        }
+
+    # --- RoutingBackend ---
+    async def pelias_search(self, text, size=1):
+        await self._delay("geocode")
+        recorded = self.recordings["geocode"].get(text)
+        if recorded is not None:
+            return recorded
+        coords = self._synthetic_coords(text)
+        return {"features": [{"geometry": {"type": "Point", "coordinates": coords}, "properties": {"label": text}}]}
+
+    async def pelias_reverse(self, point, size=1):
+        await self._delay("reverse")
+        recorded = self.recordings["reverse"].get(self._point_key(point))
+        if recorded is not None:
+            return recorded
+        label = f"Synthetic place {point[1]:.4f}, {point[0]:.4f}"
+        return {"features": [{"geometry": {"type": "Point", "coordinates": list(point[:2])}, "properties": {"label": label}}]}
+
+    async def directions(self, coordinates, profile="driving-car", format="geojson"):
+        await self._delay("directions")
+        start, end = coordinates[0], coordinates[-1]
+        recorded = self.recordings["directions"].get(f"{self._point_key(start)}|{self._point_key(end)}")
+        if recorded is not None:
+            return recorded
+        return self._synthetic_route(start, end)
+
+
+def create_backend(name=ROUTING_BACKEND):
+    if name == "ors":
+        from ors_client import AsyncOrsClient
+        return AsyncOrsClient()
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown ROUTING_BACKEND: {name} (expected 'ors' or 'local')")
@@ -0,0 +1,57 @@
+# Production launcher: N uvicorn worker processes behind one port.
+# Workers share the sqlite geocode/route caches (memory-mapped reads, see caching.py) and the
+# model artifact on disk, so a restarted or newly added worker starts warm.
+#
+#   python serve.py --workers 8 --max-in-flight 200
+
+import argparse
+import glob
+import os
+
+import uvicorn
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Deployment Defaults (override with env vars or flags) ---
+HOST = os.environ.get("TDO_HOST", "0.0.0.0")
+PORT = int(os.environ.get("TDO_PORT", 8000))
+WORKERS = int(os.environ.get("TDO_WORKERS", os.cpu_count() or 1))
+MAX_IN_FLIGHT = int(os.environ.get("TDO_MAX_IN_FLIGHT", 256))  # per worker, extra requests get 503
+BACKLOG = int(os.environ.get("TDO_BACKLOG", 2048))
+# Workers publish their metrics here so /metrics and /cacheStats cover all of them (see metrics.py)
+METRICS_DIR = os.environ.get("TDO_METRICS_DIR", os.path.join(
+    os.environ.get("TDO_CACHE_DIR", os.path.join(BASE_DIR, ".cache")), "metrics"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the TDO server with multiple worker processes")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT,
+                        help="requests in flight per worker before new ones are rejected with 503 (0 = no limit)")
+    parser.add_argument("--backlog", type=int, default=BACKLOG)
+    args = parser.parse_args()
+
+    # Workers are spawned fresh and read their settings from the environment
+    os.environ["TDO_MAX_IN_FLIGHT"] = str(args.max_in_flight)
+    os.environ["TDO_METRICS_DIR"] = METRICS_DIR
+    # Counters restart at zero with the server, drop the previous run's worker files
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_DIR, "worker-*.json*")):
+        os.remove(path)
+    print(f"[INFO] Starting {args.workers} workers on {args.host}:{args.port}, "
+          f"max {args.max_in_flight} in flight per worker")
+    uvicorn.run(
+        "server:app",
+        app_dir=BASE_DIR,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        access_log=False,  # per-request logging costs more than the request on cache hits
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,195 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from typing import List, Literal, Optional
+import time
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 import numpy as np
 import uvicorn
-import openrouteservice
-from pydantic import BaseModel
-import pickle
+from pydantic import BaseModel, Field, FiniteFloat, field_validator, model_validator
+from model_registry import ModelRegistry
+from driver_models import DriverModelStore
+from sleep_history import create_history
+from caching import GeocodeCache, RouteCache
+from routing_backend import create_backend
+from route_index import RouteIndex, fatigue_timeline
+from geometry import encode_route, pack_float32, simplify_mask
+from stages import begin_request, server_timing_header, stage
+from upstream import Upstream, UpstreamError, CircuitOpenError, begin_degraded, degrade
+import metrics
 
 app = FastAPI()
 
-sample_data = [25, 85, 0.1, 0.20, 0.60, 1, 8]
+# Loaded once at startup and hot-swapped when tdo_model.json (or TDO_MODEL_DIR) changes
+registry = ModelRegistry()
+# Per-driver coefficient table from driver_models.py, loaded on startup if DRIVER_MODELS_DIR has one
+driver_models = None
+# Time-decayed per-user sleep averages (sleep_history.py), created on startup
+sleep_history = None
+# Offline reverse geocoder (gazetteer.py), loaded on startup if GAZETTEER_DIR has an index
+gazetteer = None
+# Pelias results, in memory first then in a sqlite file shared by all workers
+geocode_cache = GeocodeCache()
 
-def get_tdo ( sample = sample_data ):
-    with open('tdo_model.pkl', 'rb') as file:
-        model = pickle.load(file)
-        
-    features = np.array(sample[:-1]).reshape(1, -1)
-    duration = sample[-1]
+ROUTE_PROFILE = 'driving-car'
+
+# Per-worker admission control, beyond this many requests in flight new ones get a 503 (0 = no limit)
+MAX_IN_FLIGHT = int(os.environ.get("TDO_MAX_IN_FLIGHT", 0))
+in_flight = 0
+
+# Geocode/directions provider, created on startup: ORS by default, ROUTING_BACKEND=local for offline load tests
+routing_backend = None
+
+sample_data = [25, 85, 0.1, 0.20, 0.60, 1, 8]  # Age, Efficiency, Deep, REM, Light, Awakenings, Duration
+SAMPLE_LENGTH = len(sample_data)
+
+# Rest stops returned with the fatigue-risk timeline, at most this many per route
+MAX_REST_POINTS = int(os.environ.get("TDO_MAX_REST_POINTS", 10))
+
+# Simplification tolerances (metres) the server actually uses; a requested one snaps down to the
+# nearest step, so each cached route holds at most this many simplified variants
+SIMPLIFY_TOLERANCES_M = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# What-if grids: at most this many cells per request
+MAX_GRID_CELLS = int(os.environ.get("TDO_MAX_GRID_CELLS", 1000000))
+
+def predict_base_tdo(features, model, driver_ids=None):
     base_tdo = model.predict(features)
-    final_tdo = base_tdo[0] * (duration / 7.0) * np.power(duration / 7.0, 0.5)
-    return final_tdo
+    if driver_ids is not None and driver_models is not None:
+        # Drivers with a personal model override the global prediction, the rest keep it
+        rows = driver_models.rows(driver_ids)
+        personal = rows >= 0
+        if personal.any():
+            base_tdo[personal] = driver_models.predict(rows[personal], features[personal])
+    return base_tdo
+
+def duration_scale(duration):
+    ratio = np.asarray(duration, dtype=float) / 7.0
+    return ratio * np.power(ratio, 0.5)
+
+def get_tdo_batch(samples, model=None, driver_ids=None):
+    # One matrix prediction for N samples, duration scaling applied column-wise
+    if model is None:
+        model = registry.model
+    samples = np.asarray(samples, dtype=float).reshape(-1, SAMPLE_LENGTH)
+    return predict_base_tdo(samples[:, :-1], model, driver_ids) * duration_scale(samples[:, -1])
 
-def get_tdo_loc(route, duration_route, final_tdo, client):
+def get_tdo_grid(durations, efficiencies, awakenings, sample=sample_data, model=None, driver_id=None):
+    # TDO over duration x efficiency x awakenings, everything else taken from `sample`.
+    # Duration only scales the prediction, so the model runs once on the efficiency x awakenings
+    # plane and the duration axis is a broadcast multiply: shape (durations, efficiencies, awakenings)
+    if model is None:
+        model = registry.model
+    efficiencies = np.asarray(efficiencies, dtype=float)
+    awakenings = np.asarray(awakenings, dtype=float)
+    features = np.tile(np.asarray(sample[:-1], dtype=float), (len(efficiencies) * len(awakenings), 1))
+    features[:, 1] = np.repeat(efficiencies, len(awakenings))
+    features[:, 5] = np.tile(awakenings, len(efficiencies))
+    driver_ids = None if driver_id is None else [driver_id] * len(features)
+    plane = predict_base_tdo(features, model, driver_ids).reshape(len(efficiencies), len(awakenings))
+    return duration_scale(durations)[:, None, None] * plane[None, :, :]
+
+def get_tdo ( sample = sample_data, driver_id = None ):
+    return get_tdo_batch([sample], driver_ids=None if driver_id is None else [driver_id])[0]
+
+def user_sample(user_id):
+    # The user's recent sleep instead of sample_data, one row read of pre-aggregated values
+    if user_id is None or sleep_history is None:
+        return sample_data
+    profile = sleep_history.get(user_id)
+    return sample_data if profile is None else profile.sample(sample_data)
+
+# Deadlines, retries, hedging and circuit breakers for every call to the routing provider
+upstream_policy = Upstream()
+
+async def upstream(call, fn):
+    # Every call to the routing provider goes through here; fn() makes the request so it can be re-sent
+    return await upstream_policy.call(call, fn)
+
+def upstream_unavailable(error):
+    retry_after = error.retry_after if isinstance(error, CircuitOpenError) else 1
+    return HTTPException(status_code=503, detail=f"Routing provider unavailable ({error})",
+                         headers={"Retry-After": str(max(1, int(retry_after)))})
+
+async def get_tdo_loc(route_index, final_tdo, client):
     # --- Locate position after TDO hours ---
-    tdo_seconds = final_tdo * 3600
-    line = route['features'][0]['geometry']['coordinates']
-    step = tdo_seconds / (duration_route * 3600)  # ratio of time passed
-    index = int(step * len(line))
-
-    if index < len(line):
-        future_position = line[index]
-        place = get_place_name_from_coords(future_position, client)
+    future_position = route_index.position_at(final_tdo * 3600)
+
+    if future_position is not None:
+        place = await get_place_name_from_coords(future_position, client)
         return place
     else:
         return None
 
-def get_coordinates(place_name, client):
-        result = client.pelias_search(text=place_name)
+async def get_coordinates(place_name, client):
+        key = geocode_cache.forward_key(place_name)
+        cached = await geocode_cache.forward.aget(key)
+        if cached is not None:
+            return tuple(cached)
+        try:
+            result = await upstream("geocode", lambda: client.pelias_search(text=place_name))
+        except UpstreamError:
+            # Places don't move, an expired entry beats failing the request
+            stale = await geocode_cache.forward.aget_stale(key)
+            if stale is None:
+                raise
+            degrade("geocode", "stale")
+            return tuple(stale)
         coords = result['features'][0]['geometry']['coordinates']
+        geocode_cache.forward.set_background(key, list(coords))
         return tuple(coords)
 
-def get_place_name_from_coords(coords, client):
-        res = client.pelias_reverse(point=coords, size=1)
-        return res['features'][0]['properties']['label']
+async def get_place_name_from_coords(coords, client):
+        if gazetteer is not None:
+            label = gazetteer.lookup([coords])[0]
+            if label is not None:
+                return label
+        key = geocode_cache.reverse_key(coords)
+        cached = await geocode_cache.reverse.aget(key)
+        if cached is not None:
+            return cached
+        try:
+            res = await upstream("reverse_geocode", lambda: client.pelias_reverse(point=coords, size=1))
+        except UpstreamError:
+            stale = await geocode_cache.reverse.aget_stale(key)
+            if stale is not None:
+                degrade("reverse_geocode", "stale")
+                return stale
+            # No name, but the app can still show the rest stop as coordinates
+            degrade("reverse_geocode", "degraded")
+            return f"{coords[1]:.5f}, {coords[0]:.5f}"
+        label = res['features'][0]['properties']['label']
+        geocode_cache.reverse.set_background(key, label)
+        return label
 
 
-def get_route_data(start_place, end_place):
-    client = openrouteservice.Client(key='5b3ce3597851110001cf6248f0228e3b0fb646b28c92af9d8cbb4562')
+def encode_route_entry(entry):
+    # For the shared sqlite tier: routeCoordinates is rebuilt from the index instead of stored twice
+    data = {key: value for key, value in entry["data"].items() if key != "routeCoordinates"}
+    return {"data": data, "index": entry["index"].to_dict()}
 
-    # start_place = input("Enter starting location: ")
-    # end_place = input("Enter destination location: ")
+def decode_route_entry(stored):
+    index = RouteIndex.from_dict(stored["index"])
+    data = dict(stored["data"])
+    data["routeCoordinates"] = [{'latitude': lat, 'longitude': lon} for lon, lat in index.coords.tolist()]
+    return {"data": data, "index": index}
+
+# Directions per (start, end, profile); concurrent misses for the same trip share one ORS call
+route_cache = RouteCache(encode=encode_route_entry, decode=decode_route_entry)
 
-    start = get_coordinates(start_place, client)
-    end = get_coordinates(end_place, client) 
 
-    route = client.directions(coordinates=[start, end], profile='driving-car', format='geojson')
+async def fetch_route(start_place, end_place, client, profile=ROUTE_PROFILE):
+    # --- Route part of the response, the same for every driver on this trip ---
+    # both ends are geocoded at the same time, one round-trip instead of two
+    with stage("geocode"):
+        start, end = await asyncio.gather(
+            get_coordinates(start_place, client),
+            get_coordinates(end_place, client),
+        )
+
+    with stage("directions"):
+        route = await upstream("directions", lambda: client.directions(coordinates=[start, end], profile=profile, format='geojson'))
     distance = route['features'][0]['properties']['segments'][0]['distance'] / 1000
     duration_route = route['features'][0]['properties']['segments'][0]['duration'] / 3600
 
@@ -61,35 +198,339 @@ def get_route_data(start_place, end_place):
           
         {'latitude': coord[1], 'longitude': coord[0]} for coord in coordinates
     ]
-    tdo = get_tdo()
-    tdo_loc = get_tdo_loc(route, duration_route, tdo, client=client)
-
     return {
-        "start_place": start_place,
-        "end_place": end_place,
-        "start_coord": {
-            "latitude": start[1],
-            "longitude": start[0]
-        },
-        "end_coord": {
-            "latitude": end[1],
-            "longitude": end[0]
-        },
-        "distance": distance,
-        "duration": duration_route,
-        "routeCoordinates": converted_coords,
-        "tdo": tdo,
-        "tdo_loc": tdo_loc
+        "index": RouteIndex.from_geojson(route),  # cumulative time per vertex, built once per route
+        "data": {
+            "start_place": start_place,
+            "end_place": end_place,
+            "start_coord": {
+                "latitude": start[1],
+                "longitude": start[0]
+            },
+            "end_coord": {
+                "latitude": end[1],
+                "longitude": end[0]
+            },
+            "distance": distance,
+            "duration": duration_route,
+            "routeCoordinates": converted_coords,
+        }
     }
 
 
+def snap_tolerance(tolerance_m):
+    # Largest step not coarser than asked for, None = no simplification
+    if tolerance_m is None or tolerance_m < SIMPLIFY_TOLERANCES_M[0]:
+        return None
+    return max(step for step in SIMPLIFY_TOLERANCES_M if step <= tolerance_m)
+
+def get_route_vertices(cached, tolerance_m):
+    # Vertices kept after simplification, so per-vertex data lines up with the returned geometry
+    kept = cached.setdefault("kept", {})
+    if tolerance_m not in kept:
+        kept[tolerance_m] = simplify_mask(cached["index"].coords, tolerance_m)
+    return kept[tolerance_m]
+
+def get_route_geometry(cached, encoding, tolerance_m):
+    # Encoded once per (encoding, tolerance) and kept alongside the cached route
+    encoded = cached.setdefault("encoded", {})
+    key = (encoding, tolerance_m)
+    if key not in encoded:
+        coords = cached["index"].coords[get_route_vertices(cached, tolerance_m)]
+        encoded[key] = encode_route(coords, encoding)
+    return encoded[key]
+
+def get_risk_timeline(cached, tdo, route_format, tolerance_m, rest_interval_hours):
+    # Fatigue risk per returned vertex and the rest stops, all from the cached cumulative route times
+    risk, rest_times, rest_positions, rest_distances = fatigue_timeline(
+        cached["index"], tdo, rest_interval_hours, MAX_REST_POINTS
+    )
+    if route_format != "points":
+        risk = risk[get_route_vertices(cached, tolerance_m)]
+    if route_format == "float32":
+        timeline = {"encoding": "float32", "count": len(risk), "data": pack_float32(risk)}
+    else:
+        timeline = {"encoding": "list", "count": len(risk), "data": np.round(risk, 3).tolist()}
+    # Named from the local gazetteer in one batch when there is one, never from Pelias
+    places = gazetteer.lookup(rest_positions) if gazetteer is not None else [None] * len(rest_times)
+    rest_points = [
+        {"time_hours": t / 3600, "distance_km": d / 1000, "latitude": lat, "longitude": lon, "place": place}
+        for t, d, (lon, lat), place in zip(rest_times.tolist(), rest_distances.tolist(), rest_positions.tolist(), places)
+    ]
+    return timeline, rest_points
+
+
+async def get_route_data(start_place, end_place, profile=ROUTE_PROFILE, route_format="points", tolerance_m=None,
+                         driver_id=None, sample=sample_data, risk_timeline=False, rest_interval_hours=None):
+    client = routing_backend
+
+    # start_place = input("Enter starting location: ")
+    # end_place = input("Enter destination location: ")
+
+    key = route_cache.key(start_place, end_place, profile)
+    try:
+        cached = await route_cache.get_or_fetch(key, lambda: fetch_route(start_place, end_place, client, profile))
+    except UpstreamError as e:
+        cached = await route_cache.get_stale(key)
+        if cached is None:
+            raise upstream_unavailable(e)
+        degrade("directions", "stale")
+
+    # --- Per-driver part, recomputed on every request ---
+    route_data = dict(cached["data"])  # copy, the cached entry is shared between requests
+    route_data["start_place"] = start_place
+    route_data["end_place"] = end_place
+    tolerance_m = snap_tolerance(tolerance_m)  # memoized per tolerance in the shared entry, keep the key set fixed
+    if route_format != "points":
+        # Compact geometry instead of one {'latitude','longitude'} dict per vertex
+        del route_data["routeCoordinates"]
+        route_data["routeGeometry"] = get_route_geometry(cached, route_format, tolerance_m)
+        route_data["simplifyTolerance"] = tolerance_m
+    with stage("predict"):
+        tdo = get_tdo(sample, driver_id=driver_id)
+    route_data["tdo"] = tdo
+    if risk_timeline:
+        with stage("risk"):
+            route_data["fatigueRisk"], route_data["restPoints"] = get_risk_timeline(
+                cached, tdo, route_format, tolerance_m, rest_interval_hours
+            )
+    with stage("reverse_geocode"):
+        route_data["tdo_loc"] = await get_tdo_loc(cached["index"], tdo, client=client)
+    return route_data
+
+
 class RouteRequest(BaseModel):
         start_place: str
         end_place: str
+        format: Literal["points", "polyline", "float32"] = "points"  # points = list of lat/lng dicts
+        simplify_tolerance: Optional[FiniteFloat] = None  # metres, Douglas-Peucker, only for polyline/float32; snapped to SIMPLIFY_TOLERANCES_M
+        driver_id: Optional[str] = None  # personal TDO model if driver_models has one for this driver
+        user_id: Optional[str] = None  # TDO from this user's sleep history, also the default driver_id
+        risk_timeline: bool = False  # fatigueRisk per returned vertex + restPoints along the route
+        rest_interval_hours: Optional[FiniteFloat] = Field(None, gt=0)  # between rest points after the first, default one TDO
+
+class TDOBatchRequest(BaseModel):
+        samples: List[List[FiniteFloat]]  # same layout as sample_data, one row per driver; NaN/inf -> 422
+        driver_ids: Optional[List[Optional[str]]] = None  # one per sample, None = global model
+
+        @field_validator("samples")
+        @classmethod
+        def non_negative_duration(cls, samples):
+            # duration_scale takes a square root, a negative duration would come back as NaN
+            bad_rows = [i for i, sample in enumerate(samples) if len(sample) == SAMPLE_LENGTH and sample[-1] < 0]
+            if bad_rows:
+                raise ValueError(f"duration (last value) must be >= 0, bad rows: {bad_rows[:10]}")
+            return samples
+
+class SleepRecord(BaseModel):
+        # Same fields as the Node Sleep document, plus what the model needs that it doesn't store
+        userId: str
+        remSleepPercentage: FiniteFloat = Field(ge=0, le=100)
+        deepSleepPercentage: FiniteFloat = Field(ge=0, le=100)
+        lightSleep: FiniteFloat = Field(ge=0, le=100)  # percent, like the other two
+        totalSleepDuration: FiniteFloat = Field(ge=0, le=24)  # hours
+        timeOfSleep: Optional[datetime] = None  # ISO date, defaults to now
+        age: Optional[FiniteFloat] = Field(None, ge=0, le=130)
+        sleepEfficiency: Optional[FiniteFloat] = Field(None, ge=0, le=100)  # percent (50-100), a 0-1 fraction is converted
+        awakenings: Optional[FiniteFloat] = Field(None, ge=0)
+
+class GridAxis(BaseModel):
+        values: Optional[List[FiniteFloat]] = Field(None, min_length=1, max_length=MAX_GRID_CELLS)  # explicit values, or
+        start: Optional[FiniteFloat] = None  # an evenly spaced start..stop range
+        stop: Optional[FiniteFloat] = None
+        num: int = Field(10, ge=1, le=MAX_GRID_CELLS)
+
+        @model_validator(mode="after")
+        def values_or_range(self):
+            if self.values is None and (self.start is None or self.stop is None):
+                raise ValueError("Grid axis needs values or start/stop")
+            return self
+
+        def size(self):
+            return len(self.values) if self.values is not None else self.num
+
+        def low(self):
+            return min(self.values) if self.values is not None else min(self.start, self.stop)
+
+        def to_array(self):
+            if self.values is not None:
+                return np.asarray(self.values, dtype=float)
+            return np.linspace(self.start, self.stop, self.num)
+
+class TDOGridRequest(BaseModel):
+        duration: GridAxis
+        efficiency: GridAxis
+        awakenings: GridAxis
+        sample: Optional[List[FiniteFloat]] = None  # fixed values for the other features, defaults to sample_data
+        user_id: Optional[str] = None  # other features from this user's sleep history instead
+        driver_id: Optional[str] = None
+        format: Literal["float32", "list"] = "float32"  # float32 = base64 of the flat C-order array
+
+        @model_validator(mode="after")
+        def bounded_grid(self):
+            # Checked on the axis sizes, before anything is allocated
+            if self.duration.low() < 0:
+                raise ValueError("duration axis must be >= 0")  # duration_scale would give NaN
+            cells = self.duration.size() * self.efficiency.size() * self.awakenings.size()
+            if cells > MAX_GRID_CELLS:
+                raise ValueError(f"Grid must have at most {MAX_GRID_CELLS} cells, got {cells}")
+            return self
+
+@app.on_event("startup")
+async def startup():
+    global routing_backend, driver_models, sleep_history, gazetteer
+    registry.start()
+    metrics_writer.start()
+    driver_models = DriverModelStore.load_if_present()
+    from gazetteer import Gazetteer  # imported (with scipy) only here, and cKDTree only if an index exists
+    gazetteer = Gazetteer.load_if_present()
+    sleep_history = create_history()
+    routing_backend = create_backend()
+
+@app.on_event("shutdown")
+async def shutdown():
+    registry.stop()
+    metrics_writer.stop()
+    if routing_backend is not None:
+        await routing_backend.aclose()
+
+@app.middleware("http")
+async def time_stages(request: Request, call_next):
+    global in_flight
+    # Stage timings go back in the Server-Timing header (used by benchmark_server.py)
+    path = request.url.path if request.url.path in known_paths() else "other"  # bounded label set
+    if MAX_IN_FLIGHT and in_flight >= MAX_IN_FLIGHT and path != "/metrics":
+        # Shed load early rather than queueing requests we can't finish in time
+        metrics.REQUESTS.labels(path, "503").inc()
+        return JSONResponse({"detail": "Server busy, retry shortly"}, status_code=503, headers={"Retry-After": "1"})
+    stages = begin_request()
+    degraded = begin_degraded()
+    in_flight += 1
+    metrics.IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        in_flight -= 1
+        metrics.IN_FLIGHT.dec()
+        metrics.REQUESTS.labels(path, str(status)).inc()
+        metrics.REQUEST_SECONDS.labels(path).observe(elapsed)
+    stages["total"] = elapsed
+    response.headers["Server-Timing"] = server_timing_header(stages)
+    if degraded:
+        response.headers["X-Degraded"] = ",".join(degraded)
+    return response
+
+_known_paths = None
+
+def known_paths():
+    global _known_paths
+    if _known_paths is None:
+        _known_paths = {route.path for route in app.routes}
+    return _known_paths
+
+def collect_cache_metrics():
+    # Cache counters are copied in from the caches' own stats before every render/snapshot
+    caches = geocode_cache.stats()
+    caches["route"] = route_cache.stats()
+    for name, stats in caches.items():
+        metrics.CACHE_LOOKUPS.labels(name, "memory_hit").set(stats["memory_hits"])
+        metrics.CACHE_LOOKUPS.labels(name, "disk_hit").set(stats["disk_hits"])
+        metrics.CACHE_LOOKUPS.labels(name, "miss").set(stats["misses"])
+        metrics.CACHE_HIT_RATIO.labels(name).set(stats["hit_ratio"])
+    metrics.COALESCED.labels().set(caches["route"]["coalesced"])
+
+def worker_cache_stats():
+    stats = geocode_cache.stats()
+    stats["route"] = route_cache.stats()
+    if gazetteer is not None:
+        stats["gazetteer"] = gazetteer.stats()
+    stats["upstream"] = upstream_policy.stats()
+    return stats
+
+metrics.add_collector(collect_cache_metrics)
+# Under serve.py (TDO_METRICS_DIR set) every worker publishes its metrics and cache stats for the others
+metrics_writer = metrics.SnapshotWriter(info=worker_cache_stats)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def getMetrics():
+    # Prometheus text format, summed over all workers when running under serve.py
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/modelInfo")
+def modelInfo():
+    return registry.info()
+
+@app.get("/cacheStats")
+def cacheStats():
+    # Top level is the worker that answered; "workers" has every live worker's, keyed by pid
+    stats = worker_cache_stats()
+    if metrics.METRICS_DIR:
+        workers = metrics.worker_info()
+        workers[str(os.getpid())] = dict(stats)  # fresher than this worker's last snapshot
+        stats["worker"] = os.getpid()
+        stats["workers"] = workers
+    return stats
+
+@app.post("/getTDO")
+def getTDO(request: TDOBatchRequest):
+    bad_rows = [i for i, sample in enumerate(request.samples) if len(sample) != SAMPLE_LENGTH]
+    if bad_rows:
+        raise HTTPException(status_code=422, detail=f"Each sample needs {SAMPLE_LENGTH} values, bad rows: {bad_rows[:10]}")
+    if request.driver_ids is not None and len(request.driver_ids) != len(request.samples):
+        raise HTTPException(status_code=422, detail="driver_ids needs one entry per sample")
+    if not request.samples:
+        return {"model_version": registry.version, "count": 0, "tdo": []}
+
+    snapshot = registry.current()  # same model for the whole batch even if a swap happens mid-request
+    with stage("predict"):
+        tdo = get_tdo_batch(request.samples, model=snapshot.model, driver_ids=request.driver_ids)
+    return {"model_version": snapshot.version, "count": len(tdo), "tdo": tdo.tolist()}
+
+@app.post("/getTDOGrid")
+def getTDOGrid(request: TDOGridRequest):
+    sample = request.sample if request.sample is not None else user_sample(request.user_id)
+    if len(sample) != SAMPLE_LENGTH:
+        raise HTTPException(status_code=422, detail=f"sample needs {SAMPLE_LENGTH} values")
+    axes = {name: getattr(request, name).to_array() for name in ("duration", "efficiency", "awakenings")}
+    shape = [len(values) for values in axes.values()]  # sizes already bounded by TDOGridRequest
+
+    snapshot = registry.current()
+    with stage("predict"):
+        grid = get_tdo_grid(axes["duration"], axes["efficiency"], axes["awakenings"], sample,
+                            model=snapshot.model, driver_id=request.driver_id)
+    response = {
+        "model_version": snapshot.version,
+        "axes": {name: values.tolist() for name, values in axes.items()},
+        "shape": shape,  # [duration, efficiency, awakenings]
+    }
+    if request.format == "list":
+        response["tdo"] = grid.tolist()
+    else:
+        response["encoding"] = "float32"
+        response["tdo"] = pack_float32(grid.ravel())
+    return response
+
+@app.post("/addSleepRecord")
+def addSleepRecord(record: SleepRecord):
+    # Called alongside the Node sleep route, folds the night into the user's running averages
+    fields = {name: value for name, value in vars(record).items() if value is not None}
+    profile, added = sleep_history.add_records(record.userId, [fields])
+    return {"userId": record.userId, "records": profile.count, "sample": profile.sample(sample_data)}
 
 @app.post("/getRoute")
-def getRoute(request: RouteRequest):
-    route_data = get_route_data(request.start_place, request.end_place)
+async def getRoute(request: RouteRequest):
+    # The sleep history read is a blocking sqlite/Mongo round-trip, keep it off the event loop
+    sample = sample_data if request.user_id is None else await asyncio.to_thread(user_sample, request.user_id)
+    route_data = await get_route_data(
+        request.start_place, request.end_place,
+        route_format=request.format, tolerance_m=request.simplify_tolerance,
+        driver_id=request.driver_id or request.user_id, sample=sample,
+        risk_timeline=request.risk_timeline, rest_interval_hours=request.rest_interval_hours,
+    )
     return route_data
 
 if __name__ == "__main__":
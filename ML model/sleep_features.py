@@ -0,0 +1,139 @@
+# One training pipeline for the TDO model: feature engineering + TDO target live here only.
+# Engineered features are cached as memory-mappable .npy files keyed by a hash of the source CSV,
+# so repeat training runs / experiments skip pandas parsing entirely.
+#
+#   python sleep_features.py [Sleep_Efficiency.csv]   # build (or reuse) the cache and print a summary
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from tdo_artifact import FEATURE_ORDER
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(BASE_DIR, "Sleep_Efficiency.csv")
+FEATURE_CACHE_DIR = os.environ.get(
+    "FEATURE_CACHE_DIR", os.path.join(os.environ.get("TDO_CACHE_DIR", os.path.join(BASE_DIR, ".cache")), "features")
+)
+# Bump when the features or the target formula change, old caches are then ignored
+PIPELINE_VERSION = 1
+
+SOURCE_COLUMNS = ["Age", "Sleep duration", "Sleep efficiency", "REM sleep percentage", "Deep sleep percentage",
+                  "Light sleep percentage", "Awakenings"]
+
+
+def tdo_target(duration, deep_ratio, rem_ratio, efficiency, awakenings):
+    """How long (hrs) a person can stay awake before feeling drowsy, works on scalars, arrays and Series."""
+    # more deep sleep & REM = longer TDO, more awakenings = shorter TDO
+    return duration * (0.5 + deep_ratio * 0.5 + rem_ratio * 0.3) * np.power(efficiency / 100, 1.5) / (0.1 + awakenings * 0.2)
+
+
+def engineer(df):
+    """Raw sleep log rows (pandas) -> dict of float64 columns: FEATURE_ORDER + duration + TDO."""
+    df = df[SOURCE_COLUMNS].dropna()
+    columns = {
+        "Age": df["Age"],
+        "Sleep efficiency": df["Sleep efficiency"],
+        # sleep quality ratios
+        "Deep/Total": df["Deep sleep percentage"] / 100,
+        "REM/Total": df["REM sleep percentage"] / 100,
+        "Light/Total": df["Light sleep percentage"] / 100,
+        "Awakenings": df["Awakenings"],
+        "Sleep duration": df["Sleep duration"],
+    }
+    columns["TDO"] = tdo_target(columns["Sleep duration"], columns["Deep/Total"], columns["REM/Total"],
+                                columns["Sleep efficiency"], columns["Awakenings"])
+    return {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+
+
+class FeatureSet:
+    """X (rows x FEATURE_ORDER, column-major), target y and sleep duration, usually memory-mapped."""
+
+    def __init__(self, X, y, duration, source_hash=None, path=None):
+        self.X = X
+        self.y = y
+        self.duration = duration
+        self.source_hash = source_hash
+        self.path = path
+
+    def __len__(self):
+        return len(self.y)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(f"pipeline-v{PIPELINE_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def _write_cache(columns, cache_path, source_path, source_hash):
+    # Write into a temp dir then rename, so concurrent runs never see a half-written cache
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    X = np.asfortranarray(np.column_stack([columns[name] for name in FEATURE_ORDER]))  # column-major = columnar
+    np.save(os.path.join(tmp_path, "X.npy"), X)
+    np.save(os.path.join(tmp_path, "y.npy"), columns["TDO"])
+    np.save(os.path.join(tmp_path, "duration.npy"), columns["Sleep duration"])
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as file:
+        json.dump({
+            "source": os.path.basename(source_path),
+            "source_hash": source_hash,
+            "pipeline_version": PIPELINE_VERSION,
+            "feature_order": FEATURE_ORDER,
+            "rows": int(len(X)),
+            "created_at": time.time(),
+        }, file, indent=2)
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Another process won the race, its cache is just as good
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_features(csv_path=DEFAULT_CSV, cache_dir=FEATURE_CACHE_DIR, mmap=True):
+    """Engineered features for csv_path, from the cache when the file hasn't changed."""
+    source_hash = file_hash(csv_path)
+    cache_path = os.path.join(cache_dir, source_hash[:16])
+    if not os.path.exists(os.path.join(cache_path, "manifest.json")):
+        import pandas as pd  # only needed on a cache miss
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache(engineer(pd.read_csv(csv_path)), cache_path, csv_path, source_hash)
+
+    mode = "r" if mmap else None
+    return FeatureSet(
+        np.load(os.path.join(cache_path, "X.npy"), mmap_mode=mode),
+        np.load(os.path.join(cache_path, "y.npy"), mmap_mode=mode),
+        np.load(os.path.join(cache_path, "duration.npy"), mmap_mode=mode),
+        source_hash=source_hash,
+        path=cache_path,
+    )
+
+
+def train_test(features, test_size=0.2, random_state=42):
+    from sklearn.model_selection import train_test_split
+    return train_test_split(features.X, features.y, test_size=test_size, random_state=random_state)
+
+
+def train_model(csv_path=DEFAULT_CSV, test_size=0.2, random_state=42):
+    """Fit the TDO LinearRegression; returns (model, X_test, y_test) for evaluation."""
+    from sklearn.linear_model import LinearRegression
+    X_train, X_test, y_train, y_test = train_test(load_features(csv_path), test_size, random_state)
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+    return model, X_test, y_test
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CSV
+    start = time.perf_counter()
+    features = load_features(csv_path)
+    print(f"{len(features)} rows, {features.X.shape[1]} features from {features.path} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,222 @@
+# Per-user sleep profile for TDO: time-decayed averages over the user's sleep records.
+# Every record folds into the stored aggregates in O(1) (decay the old sums, add the new night),
+# so a /getRoute only reads one row instead of scanning the user's history.
+#
+#   python sleep_history.py --feed sleep_records.jsonl   # backfill from the JSONL feed (see online_tdo.py)
+#
+# Stored in sqlite by default (SLEEP_HISTORY_DB). With SLEEP_HISTORY_MONGO_URL set the profiles live
+# in a Mongo collection instead (pymongo, or any server speaking the Mongo protocol).
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from caching import CACHE_DIR, SQLITE_MMAP_BYTES
+
+SLEEP_HISTORY_DB = os.environ.get("SLEEP_HISTORY_DB", os.path.join(CACHE_DIR, "sleep_history.sqlite3"))
+SLEEP_HISTORY_MONGO_URL = os.environ.get("SLEEP_HISTORY_MONGO_URL")
+HALF_LIFE_DAYS = float(os.environ.get("SLEEP_HALF_LIFE_DAYS", 3.0))  # a night 3 days ago counts half as much
+
+
+def efficiency_percent(value):
+    """sleepEfficiency in percent like sample_data (50-100); a 0-1 fraction (the CSV, online_tdo.py feeds) is converted."""
+    value = float(value)
+    return value * 100 if value <= 1 else value
+
+
+# Aggregated fields in server sample order, (record field, scale or conversion to the model's units)
+FIELDS = [
+    ("sleepEfficiency", efficiency_percent),
+    ("deepSleepPercentage", 0.01),
+    ("remSleepPercentage", 0.01),
+    ("lightSleep", 0.01),
+    ("awakenings", 1.0),
+    ("totalSleepDuration", 1.0),
+]
+
+
+def record_time(record):
+    """timeOfSleep as epoch seconds (datetime, ISO string, epoch seconds or ms), or now when missing."""
+    value = record.get("timeOfSleep")
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > 1e11 else float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+class SleepProfile:
+    """Exponentially time-decayed sums per field; the weighted mean of a field is sums / weights."""
+
+    def __init__(self, sums=None, weights=None, last_time=None, count=0, age=None):
+        self.sums = np.zeros(len(FIELDS)) if sums is None else np.asarray(sums, dtype=float)
+        self.weights = np.zeros(len(FIELDS)) if weights is None else np.asarray(weights, dtype=float)
+        self.last_time = last_time
+        self.count = count
+        self.age = age
+
+    def add(self, record, half_life_days=HALF_LIFE_DAYS):
+        values = np.full(len(FIELDS), np.nan)
+        for i, (name, scale) in enumerate(FIELDS):
+            value = record.get(name)
+            if value is not None:
+                values[i] = scale(value) if callable(scale) else float(value) * scale
+        present = ~np.isnan(values)
+        if not present.any():
+            return False
+
+        half_life = half_life_days * 86400
+        t = record_time(record)
+        if self.last_time is None or t >= self.last_time:
+            # Newer night: age the existing sums, the new one gets full weight
+            if self.last_time is not None:
+                decay = 0.5 ** ((t - self.last_time) / half_life)
+                self.sums *= decay
+                self.weights *= decay
+            self.last_time = t
+            weight = 1.0
+        else:
+            # Late arrival: weigh it by how old it is relative to the newest night
+            weight = 0.5 ** ((self.last_time - t) / half_life)
+
+        self.sums[present] += weight * values[present]
+        self.weights[present] += weight
+        self.count += 1
+        if record.get("age") is not None:
+            self.age = float(record["age"])
+        return True
+
+    def sample(self, default):
+        """Sample row in server layout, `default` values for fields the user has no data for."""
+        sample = list(default)
+        if self.age is not None:
+            sample[0] = self.age
+        known = self.weights > 0
+        means = np.divide(self.sums, self.weights, out=np.zeros_like(self.sums), where=known)
+        for i in np.flatnonzero(known):
+            sample[i + 1] = float(means[i])
+        return sample
+
+    def to_dict(self):
+        return {"sums": self.sums.tolist(), "weights": self.weights.tolist(), "last_time": self.last_time,
+                "count": self.count, "age": self.age}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["sums"], data["weights"], data["last_time"], data["count"], data.get("age"))
+
+
+class SQLiteSleepHistory:
+    """user_id -> SleepProfile in sqlite; read-modify-write runs in one write transaction across workers."""
+
+    def __init__(self, path=SLEEP_HISTORY_DB, half_life_days=HALF_LIFE_DAYS):
+        self.path = path
+        self.half_life_days = half_life_days
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS sleep_profiles (user_id TEXT PRIMARY KEY, profile TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)  # explicit transactions
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._conn().execute("SELECT profile FROM sleep_profiles WHERE user_id = ?", (str(user_id),)).fetchone()
+        return None if row is None else SleepProfile.from_dict(json.loads(row[0]))
+
+    def add_records(self, user_id, records):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # another worker adding for the same user waits here
+        try:
+            row = conn.execute("SELECT profile FROM sleep_profiles WHERE user_id = ?", (str(user_id),)).fetchone()
+            profile = SleepProfile() if row is None else SleepProfile.from_dict(json.loads(row[0]))
+            added = sum(profile.add(record, self.half_life_days) for record in records)
+            conn.execute(
+                "INSERT OR REPLACE INTO sleep_profiles (user_id, profile, updated_at) VALUES (?, ?, ?)",
+                (str(user_id), json.dumps(profile.to_dict()), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return profile, added
+
+
+class MongoSleepHistory:
+    """Same profiles in a Mongo collection, updated with a compare-and-swap on the record count."""
+
+    def __init__(self, url=SLEEP_HISTORY_MONGO_URL, database="Zendrive", collection="sleep_profiles",
+                 half_life_days=HALF_LIFE_DAYS):
+        from pymongo import MongoClient  # only needed when Mongo is configured
+        self.collection = MongoClient(url)[database][collection]
+        self.half_life_days = half_life_days
+
+    def get(self, user_id):
+        doc = self.collection.find_one({"_id": str(user_id)})
+        return None if doc is None else SleepProfile.from_dict(doc["profile"])
+
+    def add_records(self, user_id, records, retries=5):
+        from pymongo.errors import DuplicateKeyError
+        for _ in range(retries):
+            doc = self.collection.find_one({"_id": str(user_id)})
+            profile = SleepProfile() if doc is None else SleepProfile.from_dict(doc["profile"])
+            added = sum(profile.add(record, self.half_life_days) for record in records)
+            update = {"profile": profile.to_dict(), "updated_at": time.time()}
+            try:
+                if doc is None:
+                    self.collection.insert_one({"_id": str(user_id), **update})
+                    return profile, added
+                result = self.collection.replace_one(
+                    {"_id": str(user_id), "profile.count": doc["profile"]["count"]}, update
+                )
+                if result.modified_count:
+                    return profile, added
+            except DuplicateKeyError:
+                pass  # someone created the profile first, retry on top of theirs
+        raise RuntimeError(f"Sleep profile for {user_id} kept changing, gave up after {retries} tries")
+
+
+def create_history():
+    if SLEEP_HISTORY_MONGO_URL:
+        return MongoSleepHistory()
+    return SQLiteSleepHistory()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill per-user sleep profiles from a JSONL feed")
+    parser.add_argument("--feed", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "sleep_records.jsonl"))
+    args = parser.parse_args()
+
+    by_user = {}
+    with open(args.feed) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("userId") is not None:
+                    by_user.setdefault(str(record["userId"]), []).append(record)
+    history = create_history()
+    total = 0
+    for user_id, records in by_user.items():
+        records.sort(key=record_time)
+        total += history.add_records(user_id, records)[1]
+    print(f"[INFO] Added {total} sleep records for {len(by_user)} users")
+
+
+if __name__ == "__main__":
+    main()
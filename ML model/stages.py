@@ -0,0 +1,45 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS
+
+# Per-request {stage name: seconds}, set by the server middleware for every request
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+
+def begin_request():
+    stages = {}
+    _request_stages.set(stages)
+    return stages
+
+
+@contextmanager
+def stage(name):
+    """Time a block of a request, e.g. `with stage("directions"): ...`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def server_timing_header(stages):
+    """Standard Server-Timing header value (durations in ms), readable by browsers and the benchmark."""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items())
+
+
+def parse_server_timing(value):
+    stages = {}
+    for part in value.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        if not fields[0]:
+            continue
+        for field in fields[1:]:
+            if field.startswith("dur="):
+                stages[fields[0]] = float(field[4:]) / 1000.0
+    return stages
@@ -0,0 +1,98 @@
+# Compact, dependency-free TDO model artifact: the LinearRegression coefficients as versioned JSON.
+# The server evaluates it with a NumPy dot product, so it never has to import scikit-learn.
+#
+#   python tdo_artifact.py tdo_model.pkl tdo_model.json   # convert an existing pickled model
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ARTIFACT_FORMAT = "tdo-linear"
+FORMAT_VERSION = 1
+FEATURE_ORDER = ["Age", "Sleep efficiency", "Deep/Total", "REM/Total", "Light/Total", "Awakenings"]
+
+
+class LinearTDOModel:
+    """predict() compatible stand-in for the sklearn LinearRegression, evaluated as X @ coef + intercept."""
+
+    def __init__(self, coef, intercept, feature_order=FEATURE_ORDER, version=None, checksum=None, created_at=None):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_order = list(feature_order)
+        self.version = version
+        self.checksum = checksum
+        self.created_at = created_at
+
+    def predict(self, features):
+        return np.asarray(features, dtype=np.float64) @ self.coef + self.intercept
+
+
+def _checksum(payload):
+    body = {key: value for key, value in payload.items() if key != "checksum"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def to_payload(model, feature_order=FEATURE_ORDER, version=None, extra=None):
+    coef = getattr(model, "coef_", None)
+    if coef is None:
+        coef = model.coef
+    intercept = getattr(model, "intercept_", None)
+    if intercept is None:
+        intercept = model.intercept
+    coef = np.asarray(coef, dtype=np.float64).ravel()
+    if len(coef) != len(feature_order):
+        raise ValueError(f"Model has {len(coef)} coefficients but {len(feature_order)} features")
+
+    created_at = time.time()
+    payload = {
+        "format": ARTIFACT_FORMAT,
+        "format_version": FORMAT_VERSION,
+        "version": version or time.strftime("%Y%m%d-%H%M%S", time.gmtime(created_at)),
+        "created_at": created_at,
+        "feature_order": list(feature_order),
+        "coef": coef.tolist(),
+        "intercept": float(np.ravel(intercept)[0]),
+    }
+    if extra:
+        payload["extra"] = extra
+    payload["checksum"] = _checksum(payload)
+    return payload
+
+
+def export_artifact(model, path, feature_order=FEATURE_ORDER, version=None, extra=None):
+    """Write the model's coefficients to `path`, atomically so a watching server never sees half a file."""
+    payload = to_payload(model, feature_order, version, extra)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(payload, file, indent=2)
+    os.replace(tmp_path, path)
+    return payload
+
+
+def load_artifact(path):
+    with open(path) as file:
+        payload = json.load(file)
+    if payload.get("format") != ARTIFACT_FORMAT or payload.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a {ARTIFACT_FORMAT} v{FORMAT_VERSION} artifact")
+    if payload.get("checksum") != _checksum(payload):
+        raise ValueError(f"{path} failed its checksum, refusing to load it")
+    if payload["feature_order"] != FEATURE_ORDER:
+        # The server builds rows in FEATURE_ORDER, a different order would silently mis-predict
+        raise ValueError(f"{path} feature order {payload['feature_order']} != {FEATURE_ORDER}")
+    return LinearTDOModel(
+        payload["coef"], payload["intercept"], payload["feature_order"],
+        version=payload["version"], checksum=payload["checksum"], created_at=payload["created_at"],
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python tdo_artifact.py <model.pkl> <artifact.json>")
+        sys.exit(1)
+    import joblib
+    payload = export_artifact(joblib.load(sys.argv[1]), sys.argv[2])
+    print(f"Artifact {payload['version']} saved as '{sys.argv[2]}'")
@@ -0,0 +1,222 @@
+# Resilience layer for calls to the routing provider (geocode, reverse geocode, directions).
+# Every call gets a per-attempt deadline and an overall budget, jittered exponential retries, and a
+# hedged duplicate request once it has taken longer than this call's recent p95. A circuit breaker
+# per call type fails fast while the provider is down, so the server can answer from stale cache or
+# degrade instead of queueing behind timeouts.
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import metrics
+
+# --- Upstream Policy (override with env vars when deploying) ---
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 2.5))  # seconds per attempt
+UPSTREAM_BUDGET = float(os.environ.get("UPSTREAM_BUDGET", 6.0))  # seconds for all attempts of one call
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 2))
+UPSTREAM_BACKOFF = float(os.environ.get("UPSTREAM_BACKOFF", 0.1))  # first retry delay, doubles, +/- 50% jitter
+HEDGE_ENABLED = os.environ.get("UPSTREAM_HEDGE", "1") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("UPSTREAM_HEDGE_PERCENTILE", 95))
+HEDGE_MIN_DELAY = float(os.environ.get("UPSTREAM_HEDGE_MIN_DELAY", 0.05))
+HEDGE_MIN_SAMPLES = 20  # no hedging until the latency window means something
+LATENCY_WINDOW = 200
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", 5))  # consecutive failed calls before opening
+BREAKER_RESET = float(os.environ.get("BREAKER_RESET_SECONDS", 30.0))  # open this long before one probe call
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamError(Exception):
+    """An upstream call failed after its retries, or was refused by an open breaker."""
+
+    def __init__(self, call, message):
+        super().__init__(f"{call}: {message}")
+        self.call = call
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, call, retry_after):
+        super().__init__(call, f"circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe after a cool-down -> closed."""
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.name = name
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = None
+        self._lock = threading.Lock()
+        metrics.BREAKER_STATE.labels(name).set(0)
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def retry_after(self):
+        return max(0.0, self.opened_at + self.reset_after - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_after:
+                self._set_state(HALF_OPEN)
+                self.probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back (cancelled) is replaced
+                if self.probe_started is None or now - self.probe_started > UPSTREAM_BUDGET:
+                    self.probe_started = now
+                    return True
+                return False
+            return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.max_failures):
+                self._set_state(OPEN)
+                self.opened_at = time.monotonic()
+                metrics.BREAKER_OPENS.labels(self.name).inc()
+                print(f"[WARN] Circuit breaker for {self.name} opened after {self.failures} failures")
+
+
+def _retryable(error):
+    # 4xx answers (bad place name, no route) won't change on retry and say nothing about provider health
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+class Upstream:
+    """Deadlines, retries, hedging and a circuit breaker around each named upstream call."""
+
+    def __init__(self, timeout=UPSTREAM_TIMEOUT, budget=UPSTREAM_BUDGET, retries=UPSTREAM_RETRIES,
+                 backoff=UPSTREAM_BACKOFF, hedge=HEDGE_ENABLED):
+        self.timeout = timeout
+        self.budget = budget
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.breakers = {}
+        self.latencies = {}
+
+    def breaker(self, call):
+        if call not in self.breakers:
+            self.breakers[call] = CircuitBreaker(call)
+        return self.breakers[call]
+
+    def hedge_delay(self, call):
+        window = self.latencies.get(call)
+        if not self.hedge or window is None or len(window) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, float(np.percentile(window, HEDGE_PERCENTILE)))
+
+    async def _timed(self, call, fn):
+        metrics.UPSTREAM_CALLS.labels(call).inc()
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metrics.UPSTREAM_ERRORS.labels(call).inc()
+            raise
+        self.latencies.setdefault(call, deque(maxlen=LATENCY_WINDOW)).append(time.perf_counter() - start)
+        return result
+
+    async def _attempt(self, call, fn, timeout):
+        # First success of the original and (after the p95 delay) one hedged duplicate wins
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        tasks = [asyncio.ensure_future(self._timed(call, fn))]
+        try:
+            delay = self.hedge_delay(call)
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    metrics.UPSTREAM_HEDGES.labels(call).inc()
+                    tasks.append(asyncio.ensure_future(self._timed(call, fn)))
+            while tasks:
+                remaining = deadline - loop.time()
+                done, pending = await asyncio.wait(tasks, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError(f"{call} took longer than {timeout:.2f}s")
+                errors = [task.exception() for task in done]
+                for task, error in zip(done, errors):
+                    if error is None:
+                        return task.result()
+                tasks = list(pending)
+                if not tasks:
+                    raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, call, fn):
+        """Run `fn()` (a coroutine factory, so it can be re-issued) under the policy for `call`."""
+        breaker = self.breaker(call)
+        if not breaker.allow():
+            raise CircuitOpenError(call, breaker.retry_after())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget
+        attempt = 0
+        while True:
+            try:
+                result = await self._attempt(call, fn, min(self.timeout, deadline - loop.time()))
+            except Exception as e:
+                if not _retryable(e):
+                    breaker.record_success()
+                    raise
+                attempt += 1
+                backoff = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                if attempt > self.retries or loop.time() + backoff >= deadline:
+                    breaker.record_failure()
+                    raise UpstreamError(call, f"{type(e).__name__} after {attempt} attempts: {e}") from e
+                metrics.UPSTREAM_RETRIES.labels(call).inc()
+                await asyncio.sleep(backoff)
+                continue
+            breaker.record_success()
+            return result
+
+    def stats(self):
+        return {
+            call: {"state": breaker.state, "consecutive_failures": breaker.failures,
+                   "hedge_delay": self.hedge_delay(call)}
+            for call, breaker in self.breakers.items()
+        }
+
+
+# --- Degraded responses ---
+# Per-request list of fallbacks used, set by the server middleware like the stage timings
+_request_degraded = contextvars.ContextVar("request_degraded", default=None)
+
+
+def begin_degraded():
+    degraded = []
+    _request_degraded.set(degraded)
+    return degraded
+
+
+def degrade(call, kind):
+    """Record that `call` was answered by a fallback (`stale` cache or `degraded` value) in this request."""
+    metrics.UPSTREAM_FALLBACKS.labels(call, kind).inc()
+    degraded = _request_degraded.get()
+    if degraded is not None:
+        degraded.append(f"{call}:{kind}")
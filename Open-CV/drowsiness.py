@@ -0,0 +1,150 @@
+import time
+
+import cv2
+
+from face_tracking import FaceTracker, DETECT_EVERY
+
+# --- Drowsiness Thresholds ---
+LONG_CLOSURE_DURATION_THRESHOLD = 2.0 # Seconds eyes must be undetected for drowsy alert
+BLINK_RATE_WINDOW = 30.0              # Seconds to check blink rate over
+BLINK_THRESHOLD_LOW = 5               # Min blinks in window for fatigue alert
+BLINK_THRESHOLD_HIGH = 20             # Max blinks in window for high-rate alert
+MIN_BLINK_DURATION = 0.05             # Shorter "closures" are detector flicker, not blinks
+
+# --- Haar Cascade Paths (Uses standard paths from opencv-python pip package) ---
+FACE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+EYE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_eye_tree_eyeglasses.xml'
+
+# --- Detection Parameters (PC / offload defaults, the Pi scripts use smaller frames) ---
+FACE_SCALE_FACTOR = 1.15
+FACE_MIN_NEIGHBORS = 5
+FACE_MIN_SIZE = (40, 40)
+EYE_SCALE_FACTOR = 1.1
+EYE_MIN_NEIGHBORS = 3
+EYE_MIN_SIZE = (20, 20)
+
+
+def load_cascades(face_path=FACE_CASCADE_PATH, eye_path=EYE_CASCADE_PATH):
+    face_cascade = cv2.CascadeClassifier(face_path)
+    eye_cascade = cv2.CascadeClassifier(eye_path)
+    if face_cascade.empty():
+        raise IOError(f"Could not load face cascade from {face_path}")
+    if eye_cascade.empty():
+        raise IOError(f"Could not load eye cascade from {eye_path}")
+    return face_cascade, eye_cascade
+
+
+class DrowsinessDetector:
+    """Haar face/eye detection and the blink/closure state machine for one camera.
+
+    All per-driver state lives on the object, so any number of streams can run side by side.
+    process() returns the alerts raised by a frame: "DROWSY_CLOSURE", "LOW_BLINK_RATE", "HIGH_BLINK_RATE".
+    """
+
+    def __init__(self, stream_id=None, face_cascade=None, eye_cascade=None, use_tracking=True,
+                 detect_every=DETECT_EVERY, now=None, profiler=None):
+        if face_cascade is None or eye_cascade is None:
+            face_cascade, eye_cascade = load_cascades()
+        self.stream_id = stream_id
+        self.profiler = profiler # Optional StageProfiler: face_detect / eye_detect / state are marked in process()
+        self.face_cascade = face_cascade
+        self.eye_cascade = eye_cascade
+        self.face_tracker = FaceTracker(face_cascade, FACE_SCALE_FACTOR, FACE_MIN_NEIGHBORS, FACE_MIN_SIZE,
+                                        detect_every=detect_every) if use_tracking else None
+        # --- State Variables ---
+        self.blink_counter_for_rate = 0
+        self.blink_rate_start_time = time.time() if now is None else now
+        self.eye_closure_start_time = None
+        self.long_closure_alert_active = False
+        self.eyes_detected_last_frame = False # Assume eyes start open or undetected
+        self.current_closure_duration = 0.0
+        self.total_blinks = 0
+        # Last frame's detections, for drawing
+        self.face = None
+        self.eyes = []
+
+    # --- Detection ---
+    def detect_faces(self, gray):
+        if self.face_tracker is not None:
+            return self.face_tracker.faces(gray)
+        return self.face_cascade.detectMultiScale(
+            gray, scaleFactor=FACE_SCALE_FACTOR, minNeighbors=FACE_MIN_NEIGHBORS,
+            minSize=FACE_MIN_SIZE, flags=cv2.CASCADE_SCALE_IMAGE
+        )
+
+    def detect_eyes(self, gray, face):
+        x, y, w, h = face
+        eye_roi_gray = gray[y : y + int(h/1.8), x : x+w] # Upper part of the face
+        return self.eye_cascade.detectMultiScale(
+            eye_roi_gray, scaleFactor=EYE_SCALE_FACTOR, minNeighbors=EYE_MIN_NEIGHBORS,
+            minSize=EYE_MIN_SIZE, flags=cv2.CASCADE_SCALE_IMAGE
+        )
+
+    # --- State Machine for Blink/Closure Detection ---
+    def update(self, face_found, eyes_detected, current_time):
+        """Advances the state machine by one frame, returns the alerts it raised."""
+        alerts = []
+        self.current_closure_duration = 0.0
+
+        # 1. Eyes are currently DETECTED
+        if eyes_detected:
+            if not self.eyes_detected_last_frame:
+                # Transition: eyes just OPENED, a short closure before it counts as a blink
+                if self.eye_closure_start_time is not None:
+                    blink_duration = current_time - self.eye_closure_start_time
+                    if MIN_BLINK_DURATION < blink_duration < LONG_CLOSURE_DURATION_THRESHOLD:
+                        self.blink_counter_for_rate += 1
+                        self.total_blinks += 1
+                self.eye_closure_start_time = None
+                self.long_closure_alert_active = False # Can trigger alert again
+            self.eyes_detected_last_frame = True
+
+        # 2. Eyes are currently UNDETECTED (and a face *was* found)
+        elif face_found: # Only count closure if a face was present
+            if self.eyes_detected_last_frame:
+                self.eye_closure_start_time = current_time # Transition: eyes just CLOSED
+            if self.eye_closure_start_time is not None:
+                self.current_closure_duration = current_time - self.eye_closure_start_time
+                if self.current_closure_duration > LONG_CLOSURE_DURATION_THRESHOLD and not self.long_closure_alert_active:
+                    alerts.append("DROWSY_CLOSURE")
+                    self.long_closure_alert_active = True # One alert per closure event
+            self.eyes_detected_last_frame = False
+        # else: No face detected, don't change eye state based on lack of eyes alone
+
+        # --- Check Blink Rate Periodically ---
+        if current_time - self.blink_rate_start_time > BLINK_RATE_WINDOW:
+            if self.blink_counter_for_rate < BLINK_THRESHOLD_LOW:
+                alerts.append("LOW_BLINK_RATE")
+            elif self.blink_counter_for_rate > BLINK_THRESHOLD_HIGH:
+                alerts.append("HIGH_BLINK_RATE")
+            self.blink_counter_for_rate = 0
+            self.blink_rate_start_time = current_time
+        return alerts
+
+    def process(self, gray, current_time=None):
+        """Detect on one grayscale frame and update the state, returns the alerts raised."""
+        if current_time is None:
+            current_time = time.time()
+        try:
+            faces = self.detect_faces(gray)
+        except cv2.error as e:
+            print(f"[WARN] Error during face detection ({self.stream_id}): {e}")
+            if self.profiler is not None:
+                self.profiler.mark("face_detect") # The failed detection still took this frame's time
+            return [] # Skip this frame, state unchanged
+        if self.profiler is not None:
+            self.profiler.mark("face_detect")
+        self.face = tuple(faces[0]) if len(faces) > 0 else None
+        self.eyes = []
+        if self.face is not None:
+            try:
+                self.eyes = self.detect_eyes(gray, self.face)
+            except cv2.error as e:
+                print(f"[WARN] Error during eye detection ({self.stream_id}): {e}")
+                # Eyes stay undetected for this frame
+            if self.profiler is not None:
+                self.profiler.mark("eye_detect")
+        alerts = self.update(self.face is not None, len(self.eyes) > 0, current_time)
+        if self.profiler is not None:
+            self.profiler.mark("state")
+        return alerts
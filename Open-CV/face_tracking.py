@@ -0,0 +1,87 @@
+import cv2
+
+# --- Tracking Parameters ---
+# Full-frame face detection is the slowest part of the Haar loops. Between full detections the face
+# is searched for only in a window around the last box, at sizes close to the last box.
+DETECT_EVERY = 10        # Full-frame detection at least every N frames (catches a second / moved face)
+ROI_EXPAND = 0.4         # Search window = last face box grown by this fraction on every side
+ROI_SIZE_RANGE = (0.75, 1.33)  # Face sizes searched in the window, relative to the last box
+
+
+class FaceTracker:
+    """Detect-then-track for a Haar face cascade.
+
+    update() runs the cascade over the whole frame every DETECT_EVERY frames, or as soon as the face
+    is lost in its search window, and over the small window around the last box otherwise.
+    """
+
+    def __init__(self, face_cascade, scale_factor, min_neighbors, min_size,
+                 detect_every=DETECT_EVERY, expand=ROI_EXPAND, size_range=ROI_SIZE_RANGE):
+        self.face_cascade = face_cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        self.detect_every = detect_every
+        self.expand = expand
+        self.size_range = size_range
+        self.box = None          # (x, y, w, h) of the tracked face in full-frame coordinates
+        self.frames_since_full = 0
+        # Counters for checking the mode actually pays off
+        self.full_detections = 0
+        self.roi_detections = 0
+        self.roi_misses = 0
+
+    def _detect(self, gray, min_size, max_size=None):
+        kwargs = {"maxSize": max_size} if max_size else {}
+        return self.face_cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=min_size, flags=cv2.CASCADE_SCALE_IMAGE, **kwargs
+        )
+
+    def _full_frame(self, gray):
+        self.full_detections += 1
+        self.frames_since_full = 0
+        faces = self._detect(gray, self.min_size)
+        self.box = tuple(int(v) for v in faces[0]) if len(faces) > 0 else None
+        return self.box
+
+    def _search_roi(self, gray):
+        x, y, w, h = self.box
+        pad_x, pad_y = int(w * self.expand), int(h * self.expand)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(gray.shape[1], x + w + pad_x), min(gray.shape[0], y + h + pad_y)
+        low, high = self.size_range
+        min_size = (max(self.min_size[0], int(w * low)), max(self.min_size[1], int(h * low)))
+        max_size = (int(w * high) + 1, int(h * high) + 1)
+        faces = self._detect(gray[y0:y1, x0:x1], min_size, max_size)
+        if len(faces) == 0:
+            return None
+        # Closest to the previous box if the window holds more than one candidate
+        fx, fy, fw, fh = min(faces, key=lambda f: abs(x0 + f[0] - x) + abs(y0 + f[1] - y))
+        return (int(x0 + fx), int(y0 + fy), int(fw), int(fh))
+
+    def update(self, gray):
+        """Face box (x, y, w, h) for this grayscale frame, or None if there is no face."""
+        self.frames_since_full += 1
+        if self.box is None or self.frames_since_full >= self.detect_every:
+            return self._full_frame(gray)
+        box = self._search_roi(gray)
+        if box is None:
+            # Lost it in the window (moved fast, turned away): fall back to the whole frame right away
+            self.roi_misses += 1
+            return self._full_frame(gray)
+        self.roi_detections += 1
+        self.box = box
+        return box
+
+    def faces(self, gray):
+        """Same shape as detectMultiScale output for the tracked face, so loops can keep `for (x, y, w, h) in faces`."""
+        box = self.update(gray)
+        return [box] if box is not None else []
+
+    def reset(self):
+        self.box = None
+        self.frames_since_full = 0
+
+    def stats(self):
+        return {"full": self.full_detections, "roi": self.roi_detections, "roi_misses": self.roi_misses}
@@ -2,6 +2,8 @@ import cv2
 import numpy as np
 import time
 from collections import deque
+from face_tracking import FaceTracker
+from stage_profiler import StageProfiler
 
 # --- Constants ---
 # Drowsiness Thresholds (Adapted from your dlib script)
@@ -26,6 +28,14 @@ EYE_SCALE_FACTOR = 1.1
 EYE_MIN_NEIGHBORS = 3   # Often needs to be lower than face
 EYE_MIN_SIZE = (20, 20) # Adjust
 
+# Detect-then-track: full-frame face detection only every DETECT_EVERY frames (see face_tracking.py)
+USE_FACE_TRACKING = True
+DETECT_EVERY = 10
+# Per-stage timing, dumped every PROFILE_EVERY seconds and on `kill -USR1 <pid>` (see stage_profiler.py).
+# Tells whether the Pi is waiting on the camera or on the cascades before tuning anything above.
+PROFILE_STAGES = True
+PROFILE_EVERY = 30.0
+
 # MOUTH_SCALE_FACTOR = 1.3 # If using mouth cascade
 # MOUTH_MIN_NEIGHBORS = 10
 # MOUTH_MIN_SIZE = (25, 25)
@@ -55,6 +65,10 @@ eye_cascade = cv2.CascadeClassifier(EYE_CASCADE_PATH)
 if face_cascade.empty(): print("ERROR: Could not load face cascade"); exit()
 if eye_cascade.empty(): print("ERROR: Could not load eye cascade"); exit()
 # if mouth_cascade.empty(): print("WARNING: Could not load mouth cascade. Yawn detection disabled.")
+face_tracker = FaceTracker(face_cascade, FACE_SCALE_FACTOR, FACE_MIN_NEIGHBORS, FACE_MIN_SIZE,
+                           detect_every=DETECT_EVERY) if USE_FACE_TRACKING else None
+profiler = StageProfiler(dump_every=PROFILE_EVERY, enabled=PROFILE_STAGES)
+profiler.install_signal()
 
 # --- Alert Function (Replaces winsound) ---
 def trigger_alert(message_type):
@@ -93,30 +107,28 @@ last_frame_time = time.time()
 frame_count_fps = 0
 
 while True:
+    profiler.start_frame()
     ret, frame = vs.read()
     if not ret: print("[WARN] Failed to grab frame"); continue
-
-    # --- Performance Measurement ---
-    frame_count_fps += 1
-    current_time_fps = time.time()
-    elapsed_fps = current_time_fps - last_frame_time
-    if elapsed_fps >= 5.0: # Print FPS every 5 seconds
-        fps = frame_count_fps / elapsed_fps
-        print(f"[INFO] Approx FPS: {fps:.2f}")
-        last_frame_time = current_time_fps
-        frame_count_fps = 0
+    profiler.mark("capture")
 
     # --- Frame Preparation ---
     height = int(frame.shape[0] * (FRAME_WIDTH / frame.shape[1]))
     frame = cv2.resize(frame, (FRAME_WIDTH, height), interpolation=cv2.INTER_AREA)
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    profiler.mark("prepare")
     # gray = cv2.equalizeHist(gray) # Optional: Test if helps contrast
 
     # --- Face Detection ---
-    faces = face_cascade.detectMultiScale(
-        gray, scaleFactor=FACE_SCALE_FACTOR, minNeighbors=FACE_MIN_NEIGHBORS,
-        minSize=FACE_MIN_SIZE, flags=cv2.CASCADE_SCALE_IMAGE
-    )
+    if face_tracker is not None:
+        faces = face_tracker.faces(gray) # Searches near the last face, whole frame every DETECT_EVERY frames
+    else:
+        faces = face_cascade.detectMultiScale(
+            gray, scaleFactor=FACE_SCALE_FACTOR, minNeighbors=FACE_MIN_NEIGHBORS,
+            minSize=FACE_MIN_SIZE, flags=cv2.CASCADE_SCALE_IMAGE
+        )
+
+    profiler.mark("face_detect")
 
     eyes_detected_this_frame = False
     current_closure_duration = 0.0
@@ -151,6 +163,8 @@ while True:
 
         break # Process only first detected face
 
+    if len(faces) > 0: profiler.mark("eye_detect")
+
     # --- State Machine for Blink/Closure Detection ---
     current_time = time.time()
 
@@ -205,6 +219,8 @@ while True:
     # elif yawn_open_counter == 0: # Reset if mouth not detected as 'yawning'
     #     yawn_alert_active = False
 
+    profiler.mark("state")
+
     # --- Display Status on Frame (Optional) ---
     # cv2.putText(frame, f"Blinks (Rate): {blink_counter_for_rate}", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
     # if eye_closure_start_time:
@@ -216,6 +232,19 @@ while True:
     # --- Show Frame (Comment out for headless operation) ---
     cv2.imshow("Pi Zero Drowsiness Detection (Haar)", frame)
     key = cv2.waitKey(1) & 0xFF
+    profiler.mark("display")
+    profiler.end_frame()
+
+    # --- Performance Measurement (after end_frame, printing isn't charged to any stage) ---
+    frame_count_fps += 1
+    current_time_fps = time.time()
+    elapsed_fps = current_time_fps - last_frame_time
+    if elapsed_fps >= 5.0: # Print FPS every 5 seconds
+        fps = frame_count_fps / elapsed_fps
+        print(f"[INFO] Approx FPS: {fps:.2f}" + (f" | face detections {face_tracker.stats()}" if face_tracker else ""))
+        last_frame_time = current_time_fps
+        frame_count_fps = 0
+
     if key == ord('q'):
         break
     # --- Add small delay? Not usually needed if FPS is low ---
@@ -223,6 +252,7 @@ while True:
 
 # --- Cleanup ---
 print("[INFO] Cleaning up...")
+if PROFILE_STAGES: profiler.dump()
 cv2.destroyAllWindows()
 vs.release()
 # if using GPIO: GPIO.cleanup()
\ No newline at end of file
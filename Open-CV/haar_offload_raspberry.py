@@ -2,62 +2,51 @@ import cv2
 import numpy as np
 import time
 from collections import deque
+from drowsiness import (DrowsinessDetector, load_cascades, LONG_CLOSURE_DURATION_THRESHOLD,
+                        BLINK_RATE_WINDOW, BLINK_THRESHOLD_LOW, BLINK_THRESHOLD_HIGH)
+from stream_capture import LatestFrameCapture
+from stage_profiler import StageProfiler
 
 # --- User Configuration ---
 PI_IP_ADDRESS = "192.168.228.77"  # <<<--- CHANGE THIS to your Pi's actual IP Address!
 PORT = 5001                          # Port used in libcamera-vid command on Pi
 
-# --- Drowsiness Thresholds ---
-LONG_CLOSURE_DURATION_THRESHOLD = 2.0 # Seconds eyes must be undetected for drowsy alert
-BLINK_RATE_WINDOW = 30.0              # Seconds to check blink rate over
-BLINK_THRESHOLD_LOW = 5               # Min blinks in window for fatigue alert
-BLINK_THRESHOLD_HIGH = 20             # Max blinks in window for high-rate alert
-
-# --- Haar Cascade Paths (Uses standard paths from opencv-python pip package) ---
-try:
-    HAARCASCADE_BASE_PATH = cv2.data.haarcascades
-    FACE_CASCADE_PATH = HAARCASCADE_BASE_PATH + 'haarcascade_frontalface_default.xml'
-    EYE_CASCADE_PATH = HAARCASCADE_BASE_PATH + 'haarcascade_eye_tree_eyeglasses.xml'
-    # MOUTH_CASCADE_PATH = HAARCASCADE_BASE_PATH + 'haarcascade_smile.xml' # Optional/Experimental
-except AttributeError:
-    print("ERROR: Could not find cv2.data.haarcascades.")
-    print("Ensure opencv-python is installed correctly via pip.")
-    print("If using a different OpenCV install, you may need to provide the full path to cascade files.")
-    exit()
-
-# --- Detection Parameters (Tune these based on performance and accuracy on your PC) ---
+# --- Detection Parameters (Tune these in drowsiness.py, shared with ingest_server.py) ---
 # Processing frame width (can resize if needed, but stream is 640x480)
 PROC_FRAME_WIDTH = 640
-# Face Detection
-FACE_SCALE_FACTOR = 1.15 # Can be lower (more sensitive) on PC than Pi Zero (e.g., 1.1 to 1.3)
-FACE_MIN_NEIGHBORS = 5   # Higher reduces false positives (e.g., 3 to 6)
-FACE_MIN_SIZE = (40, 40) # Minimum face size to detect (pixels)
-# Eye Detection
-EYE_SCALE_FACTOR = 1.1
-EYE_MIN_NEIGHBORS = 3
-EYE_MIN_SIZE = (20, 20)
-
-# --- State Variables ---
-blink_counter_for_rate = 0
-blink_rate_start_time = time.time()
-eye_closure_start_time = None
-long_closure_alert_active = False
-eyes_detected_last_frame = False # Assume eyes start open or undetected
+# Detect-then-track: full-frame face detection only every DETECT_EVERY frames or when the face is lost,
+# otherwise just around the last face box (see face_tracking.py)
+USE_FACE_TRACKING = True
+DETECT_EVERY = 10
+# Per-stage timing (capture wait, prepare, face/eye detect, state machine, display), dumped every
+# PROFILE_EVERY seconds and on SIGUSR1 (see stage_profiler.py)
+PROFILE_STAGES = True
+PROFILE_EVERY = 30.0
 
 # --- Load Classifiers ---
 print("[INFO] Loading Haar cascades...")
-face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
-eye_cascade = cv2.CascadeClassifier(EYE_CASCADE_PATH)
-if face_cascade.empty(): print(f"ERROR: Could not load face cascade from {FACE_CASCADE_PATH}"); exit()
-if eye_cascade.empty(): print(f"ERROR: Could not load eye cascade from {EYE_CASCADE_PATH}"); exit()
+try:
+    face_cascade, eye_cascade = load_cascades()
+except (AttributeError, IOError) as e:
+    print(f"ERROR: {e}")
+    print("Ensure opencv-python is installed correctly via pip.")
+    print("If using a different OpenCV install, you may need to provide the full path to cascade files.")
+    exit()
 print("[INFO] Cascades loaded successfully.")
 
+# --- Profiler + Detector (face/eye detection + blink/closure state for this one stream) ---
+profiler = StageProfiler(dump_every=PROFILE_EVERY, enabled=PROFILE_STAGES, name=f"{PI_IP_ADDRESS}:{PORT}")
+profiler.install_signal()
+detector = DrowsinessDetector(f"{PI_IP_ADDRESS}:{PORT}", face_cascade, eye_cascade,
+                              use_tracking=USE_FACE_TRACKING, detect_every=DETECT_EVERY, profiler=profiler)
+
 # --- Alert Function (Simple console print) ---
-def trigger_alert(message_type):
-    """Prints alert messages to the console."""
+def trigger_alert(message_type, latency=None):
+    """Prints alert messages to the console, with how old the frame that raised it was."""
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     print("-----------------------------------------")
-    print(f"ALERT ({timestamp}): ", end="")
+    lag = f", frame captured {latency * 1000:.0f} ms ago" if latency is not None else ""
+    print(f"ALERT ({timestamp}{lag}): ", end="")
     if message_type == "DROWSY_CLOSURE":
         print(f"Potential Drowsiness! Eyes closed > {LONG_CLOSURE_DURATION_THRESHOLD:.1f}s")
     elif message_type == "LOW_BLINK_RATE":
@@ -76,11 +65,13 @@ stream_url = f"tcp://{PI_IP_ADDRESS}:{PORT}"
 # stream_url = f"tcp/h264://{PI_IP_ADDRESS}:{PORT}"
 
 print(f"[INFO] Attempting to connect to stream: {stream_url}")
-# Explicitly try FFMPEG backend which is often good for network streams
-vs = cv2.VideoCapture(stream_url, cv2.CAP_FFMPEG)
+# Explicitly try FFMPEG backend which is often good for network streams.
+# Frames are decoded on a separate thread that keeps only the newest one, so the loop below never
+# works through a backlog of old frames; reconnecting also happens on that thread.
+capture = LatestFrameCapture(stream_url, cv2.CAP_FFMPEG)
 
 # Check if connection was successful
-if not vs.isOpened():
+if not capture.start():
     print("="*30)
     print("ERROR: Cannot open network stream.")
     print("Troubleshooting:")
@@ -99,36 +90,20 @@ else:
 # --- Main Loop ---
 last_frame_time = time.time()
 frame_count_fps = 0
+frame_latencies = deque(maxlen=300) # Capture -> end of processing, seconds
 
 while True:
-    # --- Grab frame from Network Stream ---
-    ret, frame = vs.read()
+    # --- Grab newest frame from Network Stream ---
+    profiler.start_frame()
+    ret, frame, captured_at = capture.read(timeout=1.0)
 
     # --- Check if frame was received correctly ---
-    if not ret or frame is None:
-        print("[WARN] Failed to grab frame or frame is empty. Stream may have ended or connection lost.")
-        # Optional: Implement a reconnection logic here
-        time.sleep(0.5) # Pause briefly before trying again
-        # Try to reopen
-        vs.release()
-        vs.open(stream_url, cv2.CAP_FFMPEG)
-        if not vs.isOpened():
+    if not ret:
+        if capture.failed:
             print("[ERROR] Failed to reopen stream. Exiting.")
             break
-        else:
-            print("[INFO] Re-opened stream connection.")
-            time.sleep(1.0) # Wait after reopen
-            continue # Skip rest of loop for this iteration
-
-    # --- Performance Measurement (Optional) ---
-    frame_count_fps += 1
-    current_time_fps = time.time()
-    elapsed_fps = current_time_fps - last_frame_time
-    if elapsed_fps >= 5.0: # Print FPS every 5 seconds
-        fps = frame_count_fps / elapsed_fps
-        # print(f"[INFO] Approx PC Processing FPS: {fps:.2f}") # Uncomment to see FPS
-        last_frame_time = current_time_fps
-        frame_count_fps = 0
+        continue # Capture thread is reconnecting or no new frame yet
+    profiler.mark("capture") # Waiting for the capture thread's next frame
 
     # --- Frame Preparation ---
     # Optional resizing if you want to process at a different resolution than the stream
@@ -140,121 +115,52 @@ while True:
 
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     # Optional: gray = cv2.equalizeHist(gray) # Test if helps contrast
-
-    # --- Face Detection ---
-    faces = [] # Ensure faces is defined even if detection fails
-    try:
-        faces = face_cascade.detectMultiScale(
-            gray,
-            scaleFactor=FACE_SCALE_FACTOR,
-            minNeighbors=FACE_MIN_NEIGHBORS,
-            minSize=FACE_MIN_SIZE,
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
-    except cv2.error as e:
-        print(f"[WARN] Error during face detection: {e}")
-        # Decide how to handle - skip frame?
-        continue # Skip processing rest of this frame
-
-    eyes_detected_this_frame = False
-    current_closure_duration = 0.0 # Reset for this frame
-
-    # --- Process (First Detected) Face ---
-    if len(faces) > 0:
-        (x, y, w, h) = faces[0] # Get coordinates of the first face
-        # Optional: Draw face rectangle
-        # cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-
-        # --- Eye Detection within Face ROI ---
-        # Create ROI (Region of Interest) for eyes in the upper part of the face
-        eye_roi_gray = gray[y : y + int(h/1.8), x : x+w]
-        eye_roi_color = frame[y : y + int(h/1.8), x : x+w] # For drawing rectangles in color
-
-        eyes = [] # Ensure eyes is defined
-        try:
-            eyes = eye_cascade.detectMultiScale(
-                eye_roi_gray,
-                scaleFactor=EYE_SCALE_FACTOR,
-                minNeighbors=EYE_MIN_NEIGHBORS,
-                minSize=EYE_MIN_SIZE,
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-        except cv2.error as e:
-            print(f"[WARN] Error during eye detection: {e}")
-            # Eyes will remain undetected for this frame if error occurs
-
-        if len(eyes) > 0:
-            eyes_detected_this_frame = True
-            # Optional: Draw eye rectangles (adjust coordinates relative to the main frame)
-            # for (ex, ey, ew, eh) in eyes:
-            #     cv2.rectangle(frame, (x+ex, y+ey), (x+ex+ew, y+ey+eh), (0, 255, 0), 1)
-        # else: No eyes detected in the face ROI
-
-    # else: No faces detected in the frame
-
-    # --- State Machine for Blink/Closure Detection ---
-    current_time = time.time()
-
-    # 1. Eyes are currently DETECTED (or face wasn't found)
-    if eyes_detected_this_frame:
-        if not eyes_detected_last_frame:
-             # Transition: Eyes just OPENED (was closed/undetected before)
-             # Mark end of a potential blink/closure.
-             if eye_closure_start_time is not None:
-                 blink_duration = current_time - eye_closure_start_time
-                 # Count as blink only if duration is reasonable (not a flicker, not a long closure)
-                 if 0.05 < blink_duration < LONG_CLOSURE_DURATION_THRESHOLD:
-                     blink_counter_for_rate += 1
-                     # print(f"[DEBUG] Blink detected. Count: {blink_counter_for_rate}") # Debug
-             eye_closure_start_time = None # Reset closure timer
-             long_closure_alert_active = False # Can trigger alert again
-
-        eyes_detected_last_frame = True
-
-    # 2. Eyes are currently UNDETECTED (and a face *was* found)
-    elif len(faces) > 0: # Only count closure if a face was present
-        if eyes_detected_last_frame:
-            # Transition: Eyes just CLOSED (was open before)
-            eye_closure_start_time = current_time # Start timing the closure
-
-        # Check for long closure if eyes are still closed
-        if eye_closure_start_time is not None:
-            current_closure_duration = current_time - eye_closure_start_time
-            if current_closure_duration > LONG_CLOSURE_DURATION_THRESHOLD and not long_closure_alert_active:
-                trigger_alert("DROWSY_CLOSURE")
-                long_closure_alert_active = True # Prevent continuous alerts for this single event
-
-        eyes_detected_last_frame = False
-    # else: No face detected, don't change eye state based on lack of eyes alone
-
-    # --- Check Blink Rate Periodically ---
-    if current_time - blink_rate_start_time > BLINK_RATE_WINDOW:
-        # print(f"[INFO] Blink rate check: {blink_counter_for_rate} blinks in last {BLINK_RATE_WINDOW:.0f}s") # Debug
-        if blink_counter_for_rate < BLINK_THRESHOLD_LOW:
-            trigger_alert("LOW_BLINK_RATE")
-        elif blink_counter_for_rate > BLINK_THRESHOLD_HIGH:
-            trigger_alert("HIGH_BLINK_RATE")
-
-        # Reset for next window
-        blink_counter_for_rate = 0
-        blink_rate_start_time = current_time
+    profiler.mark("prepare")
+
+    # --- Face/Eye Detection + Blink/Closure State Machine (drowsiness.py) ---
+    for alert in detector.process(gray, time.time()):
+        trigger_alert(alert, latency=time.monotonic() - captured_at)
+    # Optional: Draw face/eye rectangles
+    # if detector.face is not None:
+    #     (x, y, w, h) = detector.face
+    #     cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+    #     for (ex, ey, ew, eh) in detector.eyes:
+    #         cv2.rectangle(frame, (x+ex, y+ey), (x+ex+ew, y+ey+eh), (0, 255, 0), 1)
 
     # --- Display Status on Frame (Optional) ---
     # Add text to the frame for visual feedback
     status_text = ""
-    if long_closure_alert_active:
+    if detector.long_closure_alert_active:
         status_text = f"ALERT: EYES CLOSED > {LONG_CLOSURE_DURATION_THRESHOLD:.1f}s!"
         cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-    elif eye_closure_start_time is not None:
-         status_text = f"Eyes Closed: {current_closure_duration:.1f}s"
+    elif detector.eye_closure_start_time is not None:
+         status_text = f"Eyes Closed: {detector.current_closure_duration:.1f}s"
          cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
 
-    # cv2.putText(frame, f"Blinks (Rate Window): {blink_counter_for_rate}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 1)
+    # cv2.putText(frame, f"Blinks (Rate Window): {detector.blink_counter_for_rate}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 1)
+
 
+    frame_latencies.append(time.monotonic() - captured_at)
 
     # --- Show Frame on PC ---
     cv2.imshow("Pi Stream Processed on PC - Press 'q' to Quit", frame)
     key = cv2.waitKey(1) & 0xFF
+    profiler.mark("display")
+    profiler.end_frame()
+
+    # --- Performance Measurement (Optional, after end_frame so printing isn't charged to any stage) ---
+    frame_count_fps += 1
+    current_time_fps = time.time()
+    elapsed_fps = current_time_fps - last_frame_time
+    if elapsed_fps >= 5.0: # Print FPS every 5 seconds
+        fps = frame_count_fps / elapsed_fps
+        # print(f"[INFO] Approx PC Processing FPS: {fps:.2f}") # Uncomment to see FPS
+        # if detector.face_tracker: print(f"[INFO] Face detections: {detector.face_tracker.stats()}")
+        if frame_latencies:
+            lat = np.percentile(np.asarray(frame_latencies) * 1000, [50, 95])
+            print(f"[INFO] Capture->processed latency p50 {lat[0]:.0f} ms, p95 {lat[1]:.0f} ms | {capture.stats()}")
+        last_frame_time = current_time_fps
+        frame_count_fps = 0
 
     # --- Quit Condition ---
     if key == ord('q'):
@@ -263,6 +169,8 @@ while True:
 
 # --- Cleanup ---
 print("[INFO] Cleaning up resources...")
-vs.release()
+print(f"[INFO] Capture stats: {capture.stats()}")
+if PROFILE_STAGES: profiler.dump()
+capture.stop()
 cv2.destroyAllWindows()
 print("[INFO] Exited.")
\ No newline at end of file
@@ -3,6 +3,8 @@ import numpy as np
 import time
 from collections import deque
 from picamera2 import Picamera2 # <<<--- IMPORT Picamera2
+from face_tracking import FaceTracker
+from stage_profiler import StageProfiler
 
 # --- Constants ---
 # ... (keep your existing constants) ...
@@ -27,6 +29,13 @@ FACE_MIN_SIZE = (40, 40)
 EYE_SCALE_FACTOR = 1.1
 EYE_MIN_NEIGHBORS = 3
 EYE_MIN_SIZE = (20, 20)
+# Detect-then-track: full-frame face detection only every DETECT_EVERY frames (biggest win on a Pi Zero)
+USE_FACE_TRACKING = True
+DETECT_EVERY = 10
+# Per-stage timing, dumped every PROFILE_EVERY seconds and on `kill -USR1 <pid>` (see stage_profiler.py).
+# Tells whether the Pi is waiting on the camera or on the cascades before tuning anything above.
+PROFILE_STAGES = True
+PROFILE_EVERY = 30.0
 
 # ... (keep other variables like state, alert function etc.) ...
 # --- State Variables ---
@@ -40,6 +49,10 @@ face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
 eye_cascade = cv2.CascadeClassifier(EYE_CASCADE_PATH)
 if face_cascade.empty(): print("ERROR: Could not load face cascade"); exit()
 if eye_cascade.empty(): print("ERROR: Could not load eye cascade"); exit()
+face_tracker = FaceTracker(face_cascade, FACE_SCALE_FACTOR, FACE_MIN_NEIGHBORS, FACE_MIN_SIZE,
+                           detect_every=DETECT_EVERY) if USE_FACE_TRACKING else None
+profiler = StageProfiler(dump_every=PROFILE_EVERY, enabled=PROFILE_STAGES)
+profiler.install_signal()
 
 # --- Alert Function ---
 # ... (keep your alert function) ...
@@ -67,9 +80,11 @@ last_frame_time = time.time()
 frame_count_fps = 0
 
 while True:
+    profiler.start_frame()
     # --- Frame Capture using Picamera2 --- <<<--- MODIFIED
     # Capture frame as a numpy array (RGB format)
     frame_rgb = picam2.capture_array()
+    profiler.mark("capture")
     # Convert RGB to BGR for OpenCV processing
     frame = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
     # No 'ret' check needed like VideoCapture, if capture_array fails it usually throws exception
@@ -83,10 +98,16 @@ while True:
     # height = int(frame.shape[0] * (FRAME_WIDTH / frame.shape[1]))
     # frame = cv2.resize(frame, (FRAME_WIDTH, height), interpolation=cv2.INTER_AREA)
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    profiler.mark("prepare")
 
     # --- Face Detection ---
     # ... (keep face detection logic) ...
-    faces = face_cascade.detectMultiScale( ... )
+    if face_tracker is not None:
+        faces = face_tracker.faces(gray) # Searches near the last face, whole frame every DETECT_EVERY frames
+    else:
+        faces = face_cascade.detectMultiScale( ... )
+
+    profiler.mark("face_detect")
 
     eyes_detected_this_frame = False
     current_closure_duration = 0.0
@@ -100,6 +121,8 @@ while True:
             eyes_detected_this_frame = True
         break # Process only first face
 
+    if len(faces) > 0: profiler.mark("eye_detect")
+
     # --- State Machine for Blink/Closure Detection ---
     # ... (keep state machine logic) ...
     current_time = time.time()
@@ -111,17 +134,22 @@ while True:
     # --- Check Blink Rate Periodically ---
     # ... (keep blink rate check) ...
 
+    profiler.mark("state")
+
     # --- Display Status on Frame (Optional) ---
     # ... (keep or comment out cv2.putText) ...
 
     # --- Show Frame (Can comment out for headless operation) ---
     cv2.imshow("Pi Zero Drowsiness Detection (Haar)", frame)
     key = cv2.waitKey(1) & 0xFF
+    profiler.mark("display")
+    profiler.end_frame()
     if key == ord('q'):
         break
 
 # --- Cleanup ---
 print("[INFO] Cleaning up...")
+if PROFILE_STAGES: profiler.dump()
 cv2.destroyAllWindows()
 picam2.stop() # <<<--- Use picam2 stop method
 # if using GPIO: GPIO.cleanup()
\ No newline at end of file
@@ -0,0 +1,197 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+# --- Ingest Configuration ---
+HEALTH_EVERY = 5.0        # Seconds between health reports per stream
+STALE_AFTER = 5.0         # A stream with no new frame for this long is reported as stalled
+RESTART_DELAY = 2.0       # Seconds before restarting a worker process that died
+MAX_RECONNECTS = 10       # Reopen attempts before a capture gives up; the stream is then reported as
+                          # disconnected and reopened from scratch every health report
+
+# Multi-camera ingest: many in-cab Pi streams processed on one box.
+#
+#   python ingest_server.py tcp://10.0.0.11:5001 tcp://10.0.0.12:5001 ...
+#   python ingest_server.py --streams-file streams.txt --workers 8 --alerts-out alerts.jsonl
+#
+# Streams are split evenly over worker processes (one per core by default). Inside a worker every
+# stream has its own capture thread (stream_capture.py) and its own DrowsinessDetector, so no state
+# is shared between drivers. Alerts and per-stream health from every worker arrive on one queue.
+
+
+def assign_streams(streams, workers):
+    """Round-robin streams over workers so no worker has more than one stream more than another."""
+    shards = [[] for _ in range(min(workers, len(streams)))]
+    for i, stream in enumerate(streams):
+        shards[i % len(shards)].append(stream)
+    return shards
+
+
+# --- Worker Process ---
+def run_stream(worker_id, url, events, stop, health_every):
+    # Imported here so the parent process never loads OpenCV / the cascades
+    import cv2
+    from drowsiness import DrowsinessDetector
+    from stream_capture import LatestFrameCapture
+
+    detector = DrowsinessDetector(url)
+    capture = LatestFrameCapture(url, cv2.CAP_FFMPEG, max_reconnects=MAX_RECONNECTS, name=url)
+    connected = capture.start()
+    if not connected:
+        events.put({"event": "health", "stream": url, "worker": worker_id, "status": "unreachable", "time": time.time()})
+
+    frames = 0
+    last_frame_at = time.monotonic()
+    last_report = time.monotonic()
+    while not stop.is_set():
+        if not connected:
+            stop.wait(health_every)
+            connected = capture.start()
+            if not connected:
+                events.put({"event": "health", "stream": url, "worker": worker_id, "status": "unreachable",
+                            "time": time.time()})
+            continue
+
+        ok, frame, captured_at = capture.read(timeout=0.5)
+        if ok:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            for alert in detector.process(gray, time.time()):
+                events.put({"event": "alert", "stream": url, "worker": worker_id, "type": alert, "time": time.time(),
+                            "latency_ms": (time.monotonic() - captured_at) * 1000})
+            frames += 1
+            last_frame_at = captured_at
+
+        now = time.monotonic()
+        if now - last_report >= health_every:
+            if capture.failed:
+                status = "disconnected"
+            elif now - last_frame_at > STALE_AFTER:
+                status = "stalled"
+            else:
+                status = "ok"
+            events.put({
+                "event": "health", "stream": url, "worker": worker_id, "status": status, "time": time.time(),
+                "fps": frames / (now - last_report), "frame_age_s": now - last_frame_at,
+                "blinks": detector.total_blinks, "capture": capture.stats(),
+                "face_detections": detector.face_tracker.stats() if detector.face_tracker else None,
+            })
+            frames = 0
+            last_report = now
+            if capture.failed:
+                capture.stop()
+                connected = False
+    capture.stop()
+
+
+def run_worker(worker_id, streams, events, stop, health_every):
+    import cv2
+    cv2.setNumThreads(1) # One core per worker, don't let OpenCV's own thread pool fight the other workers
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {worker_id % os.cpu_count()})
+        except OSError:
+            pass
+    threads = [
+        threading.Thread(target=run_stream, args=(worker_id, url, events, stop, health_every), name=url, daemon=True)
+        for url in streams
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+# --- Parent: event channel + worker supervision ---
+def format_alert(event):
+    return (f"ALERT ({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['time']))}) "
+            f"[{event['stream']}] {event['type']} (frame captured {event['latency_ms']:.0f} ms ago)")
+
+
+def print_health(health):
+    print(f"[INFO] {len(health)} streams:")
+    for stream, h in sorted(health.items()):
+        fps = f"{h['fps']:.1f} fps" if "fps" in h else "-"
+        dropped = h.get("capture", {}).get("dropped", "-")
+        print(f"  {stream:<32} worker {h['worker']:<3} {h['status']:<12} {fps:<10} dropped {dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run drowsiness detection over many Pi streams")
+    parser.add_argument("streams", nargs="*", help="stream URLs, e.g. tcp://10.0.0.11:5001")
+    parser.add_argument("--streams-file", help="file with one stream URL per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--health-every", type=float, default=HEALTH_EVERY)
+    parser.add_argument("--alerts-out", help="append every alert as a JSON line to this file")
+    parser.add_argument("--status-file", help="keep the latest health of every stream in this JSON file")
+    args = parser.parse_args()
+
+    streams = list(args.streams)
+    if args.streams_file:
+        with open(args.streams_file) as file:
+            streams += [line.strip() for line in file if line.strip() and not line.startswith("#")]
+    if not streams:
+        parser.error("no streams given")
+
+    events = mp.Queue()
+    stop = mp.Event()
+    shards = assign_streams(streams, max(1, args.workers))
+    processes = {}
+
+    def start_worker(worker_id):
+        process = mp.Process(target=run_worker, args=(worker_id, shards[worker_id], events, stop, args.health_every),
+                             name=f"ingest-worker-{worker_id}", daemon=True)
+        process.start()
+        processes[worker_id] = process
+
+    print(f"[INFO] {len(streams)} streams over {len(shards)} worker processes")
+    for worker_id in range(len(shards)):
+        start_worker(worker_id)
+
+    health = {}
+    alerts_file = open(args.alerts_out, "a") if args.alerts_out else None
+    last_print = time.monotonic()
+    try:
+        while True:
+            try:
+                event = events.get(timeout=1.0)
+            except queue.Empty:
+                event = None
+            if event is not None and event["event"] == "alert":
+                print(format_alert(event))
+                if alerts_file:
+                    alerts_file.write(json.dumps(event) + "\n")
+                    alerts_file.flush()
+            elif event is not None:
+                health[event["stream"]] = event
+
+            for worker_id, process in list(processes.items()):
+                if not process.is_alive() and not stop.is_set():
+                    print(f"[WARN] Worker {worker_id} exited with code {process.exitcode}, restarting")
+                    time.sleep(RESTART_DELAY)
+                    start_worker(worker_id)
+
+            if time.monotonic() - last_print >= args.health_every and health:
+                print_health(health)
+                if args.status_file:
+                    tmp_path = f"{args.status_file}.tmp"
+                    with open(tmp_path, "w") as file:
+                        json.dump(health, file, indent=2)
+                    os.replace(tmp_path, args.status_file)
+                last_print = time.monotonic()
+    except KeyboardInterrupt:
+        print("[INFO] Stopping workers...")
+    finally:
+        stop.set()
+        for process in processes.values():
+            process.join(timeout=5.0)
+        if alerts_file:
+            alerts_file.close()
+        print("[INFO] Exited.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import time
+
+import dlib
+import numpy as np
+from scipy.spatial import distance as dist
+
+# --- dlib Landmark Model ---
+PREDICTOR_PATH = os.environ.get("SHAPE_PREDICTOR_PATH", "shape_predictor_68_face_landmarks.dat")
+
+# Indices for facial landmarks in dlib's 68-point model
+LEFT_EYE = list(range(42, 48))
+RIGHT_EYE = list(range(36, 42))
+MOUTH = list(range(60, 68))
+
+# Constants for detecting drowsiness
+EYE_AR_THRESH = 0.25  # EAR threshold for closed eyes
+EYE_AR_CONSEC_FRAMES = 15  # Frames before triggering alert
+MOUTH_AR_THRESH = 0.6  # MAR threshold for yawning
+YAWN_CONSEC_FRAMES = 20  # Frames before yawning alert triggers
+
+YAWN_ALERT_HOLD = 2.0  # Seconds a yawn alert stays up before another yawn can raise one
+
+
+def eye_aspect_ratio(eye):
+    """Calculate the Eye Aspect Ratio (EAR) to detect blinking."""
+    A = dist.euclidean(eye[1], eye[5])
+    B = dist.euclidean(eye[2], eye[4])
+    C = dist.euclidean(eye[0], eye[3])
+    return (A + B) / (2.0 * C)
+
+def mouth_aspect_ratio(mouth):
+    """Calculate the Mouth Aspect Ratio (MAR) to detect yawning."""
+    A = dist.euclidean(mouth[1], mouth[7])  # Vertical distance
+    B = dist.euclidean(mouth[2], mouth[6])
+    C = dist.euclidean(mouth[0], mouth[4])  # Horizontal distance
+    return (A + B) / (2.0 * C)
+
+
+class LandmarkFatigueDetector:
+    """fatigue.py's dlib EAR/MAR state machine, without the webcam, window or beeps; fatigue.py runs on it.
+
+    process() returns the alerts raised by a frame: "DROWSY_CLOSURE" (EAR below EYE_AR_THRESH for
+    EYE_AR_CONSEC_FRAMES frames, once per closure) and "YAWN". Like fatigue.py there is no blink-rate
+    alert. total_blinks only counts closures that ended before the drowsy alert, for the replay benchmark.
+    """
+
+    def __init__(self, predictor_path=PREDICTOR_PATH):
+        self.detector = dlib.get_frontal_face_detector()
+        self.predictor = dlib.shape_predictor(predictor_path)
+        self.closed_frames = 0          # fatigue.py's blink_counter: consecutive frames with eyes closed
+        self.eye_closed_start = None
+        self.last_closure_duration = None  # Set on the frame the eyes reopen
+        self.drowsy_alert_triggered = False
+        self.yawn_counter = 0
+        self.yawn_flag = False
+        self.yawn_alert_start = None
+        self.total_blinks = 0
+        # Last frame's landmarks, one array per face, for drawing
+        self.landmarks = []
+
+    @property
+    def drowsy(self):
+        return self.closed_frames >= EYE_AR_CONSEC_FRAMES
+
+    def update(self, ear, mar, current_time):
+        """One face's EAR/MAR for one frame, returns the alerts raised."""
+        alerts = []
+        self.last_closure_duration = None
+        # Check if eyes are closed
+        if ear < EYE_AR_THRESH:
+            if self.eye_closed_start is None:
+                self.eye_closed_start = current_time
+            self.closed_frames += 1
+            if self.closed_frames >= EYE_AR_CONSEC_FRAMES and not self.drowsy_alert_triggered:
+                alerts.append("DROWSY_CLOSURE")
+                self.drowsy_alert_triggered = True  # Prevent continuous beeping
+        else:
+            if self.eye_closed_start is not None:
+                self.last_closure_duration = current_time - self.eye_closed_start
+                if self.closed_frames < EYE_AR_CONSEC_FRAMES:
+                    self.total_blinks += 1
+            self.eye_closed_start = None
+            self.closed_frames = 0
+            self.drowsy_alert_triggered = False
+
+        # Check for yawning
+        if mar > MOUTH_AR_THRESH:
+            self.yawn_counter += 1
+            if self.yawn_counter >= YAWN_CONSEC_FRAMES and not self.yawn_flag:
+                alerts.append("YAWN")
+                self.yawn_flag = True  # Prevent multiple alerts
+                self.yawn_alert_start = current_time
+        else:
+            self.yawn_counter = 0
+            if self.yawn_alert_start is not None and current_time - self.yawn_alert_start > YAWN_ALERT_HOLD:
+                self.yawn_flag = False  # Allow new detection
+        return alerts
+
+    def process(self, gray, current_time=None):
+        """Landmarks + EAR/MAR for every face in one grayscale frame (shared state, as in fatigue.py)."""
+        if current_time is None:
+            current_time = time.time()
+        alerts = []
+        self.landmarks = []
+        for face in self.detector(gray):
+            shape = self.predictor(gray, face)
+            landmarks = np.array([(p.x, p.y) for p in shape.parts()])
+            self.landmarks.append(landmarks)
+            ear = (eye_aspect_ratio(landmarks[LEFT_EYE]) + eye_aspect_ratio(landmarks[RIGHT_EYE])) / 2.0
+            alerts += self.update(ear, mouth_aspect_ratio(landmarks[MOUTH]), current_time)
+        return alerts
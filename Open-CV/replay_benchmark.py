@@ -0,0 +1,259 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# --- Replay Configuration ---
+DEFAULT_FPS = 30.0          # Used when a file doesn't report its frame rate
+MATCH_TOLERANCE = {         # Seconds a detected event may be off from the labeled one and still count
+    "blink": 0.5,
+    "closure": 3.0,         # Closures are labeled at their start, the alert only fires after the closure threshold
+}
+MAX_FPS_REGRESSION = 0.10   # --baseline: fail if throughput drops by more than this fraction
+
+# Headless replay of recorded drives through the vision pipelines, as fast as frames decode.
+#
+#   python replay_benchmark.py drive1.mp4 drive2.mp4 --pipelines haar,haar-full,dlib --out report.json
+#   python replay_benchmark.py drive1.mp4 --baseline last_report.json
+#
+# The detectors run on video time (frame index / fps), not wall time, so blink rates and closure
+# durations come out the same however fast the replay goes. Ground truth for a video is read from
+# <video>.events.json (or .csv) next to it, or --truth for a single video: a list of
+# {"type": "blink" | "closure", "time": seconds}, closures labeled at the moment the eyes close.
+
+
+# --- Pipelines ---
+def haar_pipeline(use_tracking):
+    def create():
+        from drowsiness import DrowsinessDetector
+        return DrowsinessDetector("replay", use_tracking=use_tracking, now=0.0)
+    return create
+
+
+def dlib_pipeline():
+    from landmark_fatigue import LandmarkFatigueDetector
+    return LandmarkFatigueDetector()
+
+
+PIPELINES = {
+    "haar": haar_pipeline(use_tracking=True),       # drowsiness.py as used by the PC offload/ingest scripts
+    "haar-full": haar_pipeline(use_tracking=False), # Same, full-frame face detection on every frame
+    "dlib": dlib_pipeline,                          # fatigue.py's LandmarkFatigueDetector (needs the 68-point predictor)
+}
+
+
+def pipeline_config(pipeline):
+    """Which configuration a pipeline benchmarks, recorded in the report next to its numbers.
+
+    The haar pipelines run drowsiness.py's parameters (haar_offload_raspberry.py, ingest_server.py),
+    not the on-Pi scripts' (haar-cascades-raspberrypi.py / haar_on_pi.py: 240/320 px frames,
+    scaleFactor 1.2, minNeighbors 4); --width 240 only matches their frame size.
+    """
+    if pipeline == "dlib":
+        import landmark_fatigue as lf
+        return {"source": "fatigue.py (landmark_fatigue.py)", "ear_thresh": lf.EYE_AR_THRESH,
+                "ear_consec_frames": lf.EYE_AR_CONSEC_FRAMES, "mar_thresh": lf.MOUTH_AR_THRESH,
+                "yawn_consec_frames": lf.YAWN_CONSEC_FRAMES,
+                "notes": "no blink-rate alerts; blinks are closures shorter than ear_consec_frames"}
+    import drowsiness as d
+    return {"source": "drowsiness.py (haar_offload_raspberry.py, ingest_server.py)",
+            "tracking": pipeline == "haar", "face_scale_factor": d.FACE_SCALE_FACTOR,
+            "face_min_neighbors": d.FACE_MIN_NEIGHBORS, "face_min_size": d.FACE_MIN_SIZE,
+            "eye_scale_factor": d.EYE_SCALE_FACTOR, "eye_min_neighbors": d.EYE_MIN_NEIGHBORS,
+            "notes": "PC offload parameters, not the on-Pi scripts' (240/320 px, scaleFactor 1.2, minNeighbors 4)"}
+
+
+# --- Ground Truth ---
+def truth_path_for(video):
+    base = os.path.splitext(video)[0]
+    for ext in (".events.json", ".events.csv"):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def load_truth(path):
+    if path.endswith(".csv"):
+        with open(path, newline="") as file:
+            events = [{"type": row["type"].strip(), "time": float(row["time"])} for row in csv.DictReader(file)]
+    else:
+        with open(path) as file:
+            events = json.load(file)
+        if isinstance(events, dict):
+            events = events["events"]
+    return sorted(events, key=lambda e: e["time"])
+
+
+def match_events(detected, truth, tolerance=MATCH_TOLERANCE):
+    """Precision/recall per event type; each labeled event is matched to the nearest unused detection in tolerance."""
+    results = {}
+    for kind in sorted({e["type"] for e in truth} | {e["type"] for e in detected if e["type"] in tolerance}):
+        tol = tolerance.get(kind, 0.5)
+        pred = np.array([e["time"] for e in detected if e["type"] == kind], dtype=float)
+        used = np.zeros(len(pred), dtype=bool)
+        offsets = []
+        for event in (e for e in truth if e["type"] == kind):
+            diff = np.abs(pred - event["time"])
+            diff[used] = np.inf
+            if len(diff) and diff.min() <= tol:
+                best = int(diff.argmin())
+                used[best] = True
+                offsets.append(pred[best] - event["time"])
+        tp = len(offsets)
+        fp = len(pred) - tp
+        fn = sum(1 for e in truth if e["type"] == kind) - tp
+        precision = tp / (tp + fp) if tp + fp else None
+        recall = tp / (tp + fn) if tp + fn else None
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else 0.0
+        results[kind] = {"tp": tp, "fp": fp, "fn": fn, "precision": precision, "recall": recall, "f1": f1,
+                         "mean_offset_s": float(np.mean(offsets)) if offsets else None}
+    return results
+
+
+# --- Replay ---
+def percentiles(samples_ms):
+    if not samples_ms:
+        return None
+    values = np.asarray(samples_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(values.max())}
+
+
+def replay(video, pipeline, width=None, max_frames=None, fps=None):
+    """Runs one video through one pipeline, returns the run's entry for the report."""
+    vs = cv2.VideoCapture(video)
+    if not vs.isOpened():
+        raise IOError(f"Cannot open video {video}")
+    fps = fps or vs.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    detector = PIPELINES[pipeline]()
+
+    decode_ms, process_ms, events = [], [], []
+    frames = 0
+    blinks = 0
+    started = time.perf_counter()
+    while max_frames is None or frames < max_frames:
+        t0 = time.perf_counter()
+        ret, frame = vs.read()
+        t1 = time.perf_counter()
+        if not ret or frame is None:
+            break
+        video_time = frames / fps
+        if width and frame.shape[1] != width:
+            ratio = width / float(frame.shape[1])
+            frame = cv2.resize(frame, (width, int(frame.shape[0] * ratio)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        alerts = detector.process(gray, video_time)
+        t2 = time.perf_counter()
+
+        decode_ms.append((t1 - t0) * 1000)
+        process_ms.append((t2 - t1) * 1000)
+        for _ in range(detector.total_blinks - blinks):
+            events.append({"type": "blink", "time": round(video_time, 3)})
+        blinks = detector.total_blinks
+        for alert in alerts:
+            kind = "closure" if alert == "DROWSY_CLOSURE" else alert.lower()
+            events.append({"type": kind, "time": round(video_time, 3)})
+        frames += 1
+    elapsed = time.perf_counter() - started
+    vs.release()
+
+    counts = {}
+    for event in events:
+        counts[event["type"]] = counts.get(event["type"], 0) + 1
+    run = {
+        "video": video, "pipeline": pipeline, "frames": frames, "video_seconds": frames / fps,
+        "wall_seconds": elapsed, "fps": frames / elapsed if elapsed else None,
+        "realtime_factor": (frames / fps) / elapsed if elapsed else None,
+        "decode_ms": percentiles(decode_ms), "process_ms": percentiles(process_ms),
+        "event_counts": counts, "events": events,
+    }
+    if getattr(detector, "face_tracker", None) is not None:
+        run["face_detections"] = detector.face_tracker.stats()
+    return run
+
+
+# --- Regression Check ---
+def compare(report, baseline, max_regression=MAX_FPS_REGRESSION):
+    """Prints throughput/latency change per (video, pipeline) against an earlier report, True if nothing regressed."""
+    previous = {(r["video"], r["pipeline"]): r for r in baseline["runs"]}
+    ok = True
+    for run in report["runs"]:
+        old = previous.get((run["video"], run["pipeline"]))
+        if old is None or not old.get("fps") or not run.get("fps"):
+            continue
+        change = run["fps"] / old["fps"] - 1
+        p95_old, p95_new = old["process_ms"]["p95"], run["process_ms"]["p95"]
+        regressed = change < -max_regression
+        ok = ok and not regressed
+        print(f"[{'WARN' if regressed else 'INFO'}] {run['pipeline']:<10} {os.path.basename(run['video'])}: "
+              f"{old['fps']:.1f} -> {run['fps']:.1f} fps ({change:+.1%}), "
+              f"p95 {p95_old:.2f} -> {p95_new:.2f} ms")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded video through the drowsiness pipelines")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--pipelines", default="haar", help=f"comma separated, from: {', '.join(PIPELINES)}")
+    parser.add_argument("--truth", help="ground-truth events file (only with a single video)")
+    parser.add_argument("--width", type=int, help="resize frames to this width before processing")
+    parser.add_argument("--fps", type=float, help="override the frame rate the files report")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--out", default="replay_report.json")
+    parser.add_argument("--baseline", help="earlier report to compare throughput against")
+    parser.add_argument("--max-regression", type=float, default=MAX_FPS_REGRESSION)
+    args = parser.parse_args()
+
+    pipelines = [p.strip() for p in args.pipelines.split(",") if p.strip()]
+    unknown = [p for p in pipelines if p not in PIPELINES]
+    if unknown:
+        parser.error(f"unknown pipeline(s): {', '.join(unknown)}")
+    if args.truth and len(args.videos) > 1:
+        parser.error("--truth only works with a single video, use <video>.events.json files instead")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "opencv": cv2.__version__,
+                        "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "settings": {"width": args.width, "max_frames": args.max_frames, "tolerance_s": MATCH_TOLERANCE},
+        "pipelines": {pipeline: pipeline_config(pipeline) for pipeline in pipelines},
+        "runs": [],
+    }
+    for pipeline, config in report["pipelines"].items():
+        print(f"[INFO] {pipeline}: {config['source']} - {config['notes']}")
+    for video in args.videos:
+        truth_file = args.truth or truth_path_for(video)
+        truth = load_truth(truth_file) if truth_file else None
+        for pipeline in pipelines:
+            print(f"[INFO] Replaying {video} through {pipeline}...")
+            run = replay(video, pipeline, args.width, args.max_frames, args.fps)
+            if truth is not None:
+                run["truth_file"] = truth_file
+                run["accuracy"] = match_events(run["events"], truth)
+            report["runs"].append(run)
+            p = run["process_ms"] or {}
+            print(f"[INFO] {run['frames']} frames in {run['wall_seconds']:.2f}s ({run['fps']:.1f} fps, "
+                  f"{run['realtime_factor']:.1f}x realtime), per-frame p50 {p.get('p50', 0):.2f} ms "
+                  f"p95 {p.get('p95', 0):.2f} ms p99 {p.get('p99', 0):.2f} ms | events {run['event_counts']}")
+            for kind, acc in run.get("accuracy", {}).items():
+                print(f"       {kind}: tp {acc['tp']} fp {acc['fp']} fn {acc['fn']} f1 {acc['f1']:.2f}")
+
+    with open(args.out, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"[INFO] Report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            if not compare(report, json.load(file), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import os
+import signal
+import time
+
+import numpy as np
+
+# --- Profiling Parameters ---
+PROFILE_WINDOW = 300       # Rolling window: the last N samples of each stage
+PROFILE_EVERY = float(os.environ.get("PROFILE_EVERY", 30.0))  # Seconds between dumps (0 = only on SIGUSR1)
+PROFILE_OUT = os.environ.get("PROFILE_OUT")  # Also write every dump as JSON to this file
+HIST_EDGES_MS = [0, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")]
+
+STAGES = ("capture", "prepare", "face_detect", "eye_detect", "state", "display")
+IO_STAGES = ("capture",)                    # Waiting for / decoding frames
+CASCADE_STAGES = ("face_detect", "eye_detect")
+
+
+class StageProfiler:
+    """Per-stage timers for a frame loop, kept as rolling windows and dumped as histograms.
+
+    Call start_frame() at the top of the loop and mark(stage) after each stage: a stage's time is the
+    time since the previous mark. end_frame() closes the frame and dumps every PROFILE_EVERY seconds,
+    or on the next frame after SIGUSR1 (kill -USR1 <pid>). Disabled, every call returns right away.
+    """
+
+    def __init__(self, stages=STAGES, window=PROFILE_WINDOW, dump_every=PROFILE_EVERY, out_path=PROFILE_OUT,
+                 enabled=True, name="frame loop"):
+        self.stages = tuple(stages)
+        self.window = window
+        self.dump_every = dump_every
+        self.out_path = out_path
+        self.enabled = enabled
+        self.name = name
+        # Plain lists as ring buffers: a list store is cheaper than a numpy scalar store
+        self._samples = {stage: [] for stage in self.stages + ("frame",)}
+        self._pos = {stage: 0 for stage in self._samples}
+        self._totals = dict.fromkeys(self._samples, 0.0)  # Seconds per stage since the last dump, for shares
+        self._frame_start = None
+        self._last = None
+        self._frames = 0
+        self._dump_requested = False
+        self._last_dump = time.monotonic()
+        self._frames_at_dump = 0
+
+    def install_signal(self, signum=getattr(signal, "SIGUSR1", None)):
+        """Dump on this signal (not available on Windows, there only the periodic dump runs)."""
+        if not self.enabled or signum is None:
+            return False
+        # Only set a flag here, printing from inside a signal handler can interleave with the loop's output
+        signal.signal(signum, lambda *_: setattr(self, "_dump_requested", True))
+        return True
+
+    def _add(self, stage, seconds):
+        self._totals[stage] += seconds
+        samples = self._samples[stage]
+        if len(samples) < self.window:
+            samples.append(seconds)
+        else:
+            samples[self._pos[stage]] = seconds
+            self._pos[stage] = (self._pos[stage] + 1) % self.window
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Time since the previous mark (or start_frame) goes to `stage`."""
+        if not self.enabled or self._last is None:
+            return
+        now = time.perf_counter()
+        self._add(stage, now - self._last)
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        self._add("frame", time.perf_counter() - self._frame_start)
+        self._frame_start = None
+        self._frames += 1
+        if self._dump_requested or (self.dump_every and time.monotonic() - self._last_dump >= self.dump_every):
+            self._dump_requested = False
+            self.dump()
+
+    # --- Reporting ---
+    def summary(self):
+        """Percentiles (ms), share of frame time and histogram counts per stage over the rolling window."""
+        now = time.monotonic()
+        elapsed = now - self._last_dump
+        frames = self._frames - self._frames_at_dump
+        frame_total = self._totals["frame"]
+        stages = {}
+        for stage in self.stages + ("frame",):
+            values = np.asarray(self._samples[stage]) * 1000
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            # Share of the loop's time since the last dump (percentiles are over the rolling window)
+            share = self._totals[stage] / frame_total if frame_total else None
+            stages[stage] = {
+                "count": int(len(values)), "mean": float(values.mean()), "p50": float(p50), "p95": float(p95),
+                "p99": float(p99), "max": float(values.max()), "share": float(share) if share is not None else None,
+                "histogram": np.histogram(values, bins=HIST_EDGES_MS)[0].tolist(),
+            }
+        io = sum(stages[s]["share"] or 0 for s in IO_STAGES if s in stages)
+        cascades = sum(stages[s]["share"] or 0 for s in CASCADE_STAGES if s in stages)
+        return {
+            "name": self.name, "time": time.time(), "frames": frames,
+            "fps": frames / elapsed if elapsed > 0 else None, "window": self.window,
+            "histogram_edges_ms": HIST_EDGES_MS[:-1], "stages": stages,
+            "bound": None if not stages else ("io" if io > cascades else "cascades"),
+        }
+
+    def dump(self):
+        summary = self.summary()
+        fps = f"{summary['fps']:.1f} fps" if summary["fps"] else "-"
+        print(f"[PROFILE] {self.name}: {summary['frames']} frames since last dump, {fps}, "
+              f"last {self.window} samples per stage (ms):")
+        print(f"  {'stage':<12} {'share':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for stage, s in summary["stages"].items():
+            share = f"{s['share']:.0%}" if s["share"] is not None and stage != "frame" else ""
+            print(f"  {stage:<12} {share:>6} {s['mean']:>8.2f} {s['p50']:>8.2f} {s['p95']:>8.2f} "
+                  f"{s['p99']:>8.2f} {s['max']:>8.2f}")
+        if summary["bound"]:
+            print(f"[PROFILE] Bound by {'I/O (capture)' if summary['bound'] == 'io' else 'the Haar cascades'}")
+        if self.out_path:
+            tmp_path = f"{self.out_path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(summary, file, indent=2)
+            os.replace(tmp_path, self.out_path)
+        self._last_dump = time.monotonic()
+        self._frames_at_dump = self._frames
+        self._totals = dict.fromkeys(self._samples, 0.0)
+        return summary
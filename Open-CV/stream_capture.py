@@ -0,0 +1,124 @@
+import threading
+import time
+
+import cv2
+
+# --- Capture Parameters ---
+RECONNECT_DELAY = 0.5      # Seconds to wait before reopening a dropped stream (doubles up to RECONNECT_MAX_DELAY)
+RECONNECT_MAX_DELAY = 5.0
+MAX_RECONNECTS = None      # Give up after this many failed reopen attempts in a row (None = keep trying)
+
+
+class LatestFrameCapture:
+    """Decodes a video stream on its own thread and keeps only the newest frame.
+
+    Detection slower than the stream would otherwise leave frames queueing inside FFMPEG, and alerts
+    would trail reality by seconds. Here the decoder is always drained; frames nobody picked up in
+    time are dropped and counted.
+    """
+
+    def __init__(self, source, backend=cv2.CAP_FFMPEG, reconnect_delay=RECONNECT_DELAY,
+                 max_reconnects=MAX_RECONNECTS, name="capture"):
+        self.source = source
+        self.backend = backend
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.name = name
+        self.vs = None
+        self._cond = threading.Condition()
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0             # Number of the newest frame
+        self._read_seq = 0        # Number of the last frame handed to read()
+        self._running = False
+        self._thread = None
+        self.failed = False       # Set once reconnecting has been given up
+        # Counters
+        self.decoded = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.reconnects = 0
+
+    def _open(self):
+        vs = cv2.VideoCapture(self.source, self.backend) if self.backend is not None else cv2.VideoCapture(self.source)
+        if not vs.isOpened():
+            vs.release()
+            return None
+        return vs
+
+    def start(self):
+        """Opens the stream and starts decoding, False if it can't be opened at all. Also restarts after failed."""
+        self.vs = self._open()
+        if self.vs is None:
+            return False
+        with self._cond:
+            self.failed = False
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-reader", daemon=True)
+        self._thread.start()
+        return True
+
+    def _reconnect(self):
+        delay = self.reconnect_delay
+        attempts = 0
+        self.vs.release()
+        while self._running:
+            time.sleep(delay)
+            self.vs = self._open()
+            if self.vs is not None:
+                self.reconnects += 1
+                print(f"[INFO] Re-opened stream connection ({self.source}).")
+                return True
+            attempts += 1
+            if self.max_reconnects is not None and attempts >= self.max_reconnects:
+                print(f"[ERROR] Failed to reopen stream {self.source} after {attempts} attempts.")
+                return False
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        return False
+
+    def _run(self):
+        while self._running:
+            ret, frame = self.vs.read()
+            if not ret or frame is None:
+                print("[WARN] Failed to grab frame or frame is empty. Stream may have ended or connection lost.")
+                if not self._reconnect():
+                    break
+                continue
+            now = time.monotonic()
+            with self._cond:
+                if self._seq > self._read_seq:
+                    self.dropped += 1  # The previous frame was never processed
+                self._frame = frame
+                self._captured_at = now
+                self._seq += 1
+                self.decoded += 1
+                self._cond.notify_all()
+        with self._cond:
+            self.failed = self._running  # Stopped by itself, not by stop()
+            self._running = False
+            self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """(ok, frame, captured_at) for the newest frame not returned yet; captured_at is time.monotonic()."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._seq == self._read_seq:
+                remaining = deadline - time.monotonic()
+                if not self._running or remaining <= 0:
+                    return False, None, None
+                self._cond.wait(remaining)
+            self._read_seq = self._seq
+            self.delivered += 1
+            return True, self._frame, self._captured_at
+
+    def stats(self):
+        return {"decoded": self.decoded, "delivered": self.delivered, "dropped": self.dropped,
+                "reconnects": self.reconnects}
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        # A reader stuck inside a blocking read keeps its handle, releasing it under it can crash FFMPEG
+        if self.vs is not None and (self._thread is None or not self._thread.is_alive()):
+            self.vs.release()
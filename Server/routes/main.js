@@ -3,6 +3,7 @@ const bodyParser = require("body-parser");
 
 // const authRouter = require("./authorization");
 const userRouter = require("./user");
+const sleepRouter = require("./sleep");
 
 const router = express.Router();
 
@@ -10,5 +11,6 @@ router.use(bodyParser.json());
 
 // router.use("/auth", authRouter);
 router.use("/user", userRouter);
+router.use("/user", sleepRouter); // POST /user/:userId/record
 
 module.exports = router;
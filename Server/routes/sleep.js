@@ -1,14 +1,48 @@
 const express = require("express");
 const bodyParser = require("body-parser");
-const { User, Sleep } = require("../database");
+const mongoose = require("mongoose");
+const { UserDb: User, SleepDb: Sleep } = require("../database");
 const sleepRouter = express.Router();
 
+// TDO server (ML model/server.py), keeps a per-user sleep profile for route planning
+const TDO_SERVER_URL = process.env.TDO_SERVER_URL || "http://localhost:8000";
+
+/**
+ * Forwards a saved sleep record to the TDO server's /addSleepRecord.
+ * Fire-and-forget: the record is already in Mongo, a TDO server outage only delays the profile.
+ */
+async function forwardSleepRecord(sleepData, age) {
+  try {
+    const response = await fetch(`${TDO_SERVER_URL}/addSleepRecord`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        userId: String(sleepData.userId),
+        remSleepPercentage: sleepData.remSleepPercentage,
+        deepSleepPercentage: sleepData.deepSleepPercentage,
+        lightSleep: sleepData.lightSleep,
+        totalSleepDuration: sleepData.totalSleepDuration,
+        timeOfSleep: sleepData.timeOfSleep.toISOString(),
+        age: age,
+      }),
+    });
+    if (!response.ok) {
+      console.error(
+        `TDO server rejected sleep record ${sleepData._id}: ${response.status}`,
+        await response.text()
+      );
+    }
+  } catch (error) {
+    console.error(`Error forwarding sleep record ${sleepData._id} to TDO server:`, error);
+  }
+}
+
 /**
  * @route   POST /api/users/:userId/sleep
  * @desc    Add a new sleep data record for a specific user
  * @access  Protected (User should likely only add their own sleep data)
  */
-router.post("/:userId/record", async (req, res) => {
+sleepRouter.post("/:userId/record", async (req, res) => {
   const { userId } = req.params;
   const {
     remSleepPercentage,
@@ -43,7 +77,7 @@ router.post("/:userId/record", async (req, res) => {
 
   try {
     // 2. Check if the user exists
-    const userExists = await User.findById(userId).select("_id"); // Only select ID for check
+    const userExists = await User.findById(userId).select("_id age"); // ID for the check, age for the TDO server
     if (!userExists) {
       console.warn(`Add sleep data failed: User not found with ID: ${userId}`);
       return res.status(404).json({ message: "User not found" });
@@ -73,6 +107,9 @@ router.post("/:userId/record", async (req, res) => {
     );
     console.log(`Updated user ${userId}'s sleepArray.`);
 
+    // 5b. Update the user's sleep profile on the TDO server (not awaited)
+    forwardSleepRecord(savedSleepData, userExists.age);
+
     // 6. Respond with the created sleep data
     res.status(201).json(savedSleepData); // 201 Created status
   } catch (error) {